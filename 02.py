@@ -1,59 +1,254 @@
 #!/usr/bin/env python
 
-from typing import List
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from intcode import IntCodeProgram, load_program
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Number of program instances run in lockstep by the batch interpreter
+BATCH_SIZE = 4096
+
+# Operands past this magnitude could overflow int64, those rows are left to
+# the exact interpreter
+BATCH_LIMIT = float(2 ** 62)
 
 
 def parse_program(program: List[int]) -> List[int]:
-    pg_cpy = program.copy()
+    pg = IntCodeProgram(program)
+    pg.output()
+
+    return pg.memory()
+
+
+def pg_result(pg: IntCodeProgram, noun: int, verb: int) -> int:
+    # `pg` is never run itself, every candidate is a copy-on-write fork of it
+    run = pg.fork()
+    run.write(1, noun)
+    run.write(2, verb)
+    run.output()
+
+    return run.read(0)
+
+
+def parse_program_batch(memories: 'np.ndarray') -> Tuple['np.ndarray', 'np.ndarray']:
+    '''
+    Runs K copies of an add/mul program in lockstep, one per row of the K x N
+    int64 `memories` array. Every instruction is applied to all the rows
+    still running at once, as a vectorized gather of its operands and a
+    scatter of its results.
+
+    Rows that leave the fast path are masked off and flagged in the returned
+    `diverged` array, so the caller can run them again through the exact
+    interpreter. That happens on an opcode other than add, multiply or halt,
+    an address out of range, or a result that might not fit in int64.
+    '''
+    mem = memories.copy()
+    k, n = mem.shape
+    running = np.ones(k, dtype=bool)
+    diverged = np.zeros(k, dtype=bool)
 
     i = 0
-    while i < len(pg_cpy):
-        code = pg_cpy[i]
+    while i < n and running.any():
+        rows = np.nonzero(running)[0]
+        codes = mem[rows, i]
+        running[rows[codes == 99]] = False
+
+        if i + 3 >= n:
+            bad = rows[codes != 99]
+        else:
+            bad = rows[(codes != 1) & (codes != 2) & (codes != 99)]
+
+            ops = (codes == 1) | (codes == 2)
+            rows, codes = rows[ops], codes[ops]
+            a, b, r = mem[rows, i+1], mem[rows, i+2], mem[rows, i+3]
+
+            in_range = (a >= 0) & (a < n) & (b >= 0) & (b < n) & (r >= 0) & (r < n)
+            bad = np.concatenate([bad, rows[~in_range]])
+            rows, codes, a, b, r = rows[in_range], codes[in_range], a[in_range], b[in_range], r[in_range]
+
+            x, y = mem[rows, a], mem[rows, b]
+            fx, fy = x.astype(np.float64), y.astype(np.float64)
+            overflow = np.where(codes == 1, np.abs(fx) + np.abs(fy), np.abs(fx * fy)) >= BATCH_LIMIT
+            bad = np.concatenate([bad, rows[overflow]])
+
+            fits = ~overflow
+            rows, codes, x, y, r = rows[fits], codes[fits], x[fits], y[fits], r[fits]
+            mem[rows, r] = np.where(codes == 1, x + y, x * y)
+
+        running[bad] = False
+        diverged[bad] = True
+        i += 4
+
+    return (mem, diverged)
+
+
+def pg_results_batch(pg: List[int], pairs: Sequence[Tuple[int, int]]) -> Iterator[int]:
+    '''
+    Yields position 0 after running `pg` with every (noun, verb) in `pairs`,
+    in order, BATCH_SIZE instances at a time. Without numpy, or for programs
+    that don't fit in int64, every pair goes through the exact interpreter.
+
+    Diverged rows are only run again when they are reached, so a caller that
+    stops at the first match never runs, or fails on, the rows after it.
+    '''
+    base = IntCodeProgram(pg, restart=False)
+
+    try:
+        image = np.array(pg, dtype=np.int64) if np is not None else None
+    except OverflowError:
+        image = None
+
+    if image is None:
+        for noun, verb in pairs:
+            yield pg_result(base, noun, verb)
+        return
+
+    for start in range(0, len(pairs), BATCH_SIZE):
+        chunk = pairs[start:start+BATCH_SIZE]
+        memories = np.tile(image, (len(chunk), 1))
+        memories[:, 1] = [noun for noun, _verb in chunk]
+        memories[:, 2] = [verb for _noun, verb in chunk]
+
+        final, diverged = parse_program_batch(memories)
+        for idx, (result, rerun) in enumerate(zip(final[:, 0].tolist(), diverged.tolist())):
+            yield pg_result(base, *chunk[idx]) if rerun else result
 
+
+# A polynomial in noun and verb, as {(noun exponent, verb exponent): coefficient}.
+# Cells whose value can't be tracked (read through an unknown address) are None.
+Poly = Dict[Tuple[int, int], int]
+
+
+def poly_const(p: Optional[Poly]) -> Optional[int]:
+    if p is None or any(exp != (0, 0) for exp in p):
+        return None
+
+    return p.get((0, 0), 0)
+
+
+def poly_add(a: Poly, b: Poly) -> Poly:
+    result = dict(a)
+    for exp, c in b.items():
+        result[exp] = result.get(exp, 0) + c
+
+    return {exp: c for exp, c in result.items() if c != 0}
+
+
+def poly_mul(a: Poly, b: Poly) -> Poly:
+    result: Poly = {}
+    for (a_n, a_v), a_c in a.items():
+        for (b_n, b_v), b_c in b.items():
+            exp = (a_n + b_n, a_v + b_v)
+            result[exp] = result.get(exp, 0) + a_c * b_c
+
+    return {exp: c for exp, c in result.items() if c != 0}
+
+
+def parse_program_symbolic(program: List[int]) -> Optional[Poly]:
+    '''
+    Runs `program` with noun and verb (positions 1 and 2) left unknown and
+    returns position 0 as a polynomial in them. Returns None when the data
+    flow depends on the unknowns in a way that can't be followed: an unknown
+    write address or opcode, an out of range address or an opcode other than
+    add, multiply or halt.
+    '''
+    mem: List[Optional[Poly]] = [{(0, 0): x} if x else {} for x in program]
+    mem[1] = {(1, 0): 1}
+    mem[2] = {(0, 1): 1}
+
+    i = 0
+    while i < len(mem):
+        code = poly_const(mem[i])
         if code == 99:
-            return pg_cpy
+            break
+        elif code not in (1, 2) or i + 3 >= len(mem):
+            return None
+
+        a, b, r = (poly_const(mem[i+k]) for k in (1, 2, 3))
+        if r is None or not 0 <= r < len(mem):
+            return None
+
+        if any(addr is not None and not 0 <= addr < len(mem) for addr in (a, b)):
+            return None
+
+        # A read through an unknown address gives an unknown value, which is
+        # fine as long as it never ends up used as an address or opcode
+        val_a = mem[a] if a is not None else None
+        val_b = mem[b] if b is not None else None
+
+        if val_a is None or val_b is None:
+            mem[r] = None
         elif code == 1:
-            a = pg_cpy[i+1]
-            b = pg_cpy[i+2]
-            r = pg_cpy[i+3]
-            pg_cpy[r] = pg_cpy[a]+pg_cpy[b]
-            i+=4
-        elif code == 2:
-            a = pg_cpy[i+1]
-            b = pg_cpy[i+2]
-            r = pg_cpy[i+3]
-            pg_cpy[r] = pg_cpy[a]*pg_cpy[b]
-            i+=4
+            mem[r] = poly_add(val_a, val_b)
         else:
-            raise Exception(f"Unknown code at position ({i}): {code}")
+            mem[r] = poly_mul(val_a, val_b)
 
-    return pg_cpy
+        i += 4
 
+    return mem[0]
 
-def pg_result(pg: List[int], noun: int, verb: int) -> int:
-    pg_cpy = pg.copy()
-    pg_cpy[1] = noun
-    pg_cpy[2] = verb
-    return parse_program(pg_cpy)[0]
+
+def solve_noun_verb(result: Poly, expected_result: int) -> Optional[Tuple[int, int]]:
+    # Same search order as the brute force, so the same pair is found first
+    for noun in range(0, 100):
+        by_verb_exp: Dict[int, int] = {}
+        for (n_exp, v_exp), c in result.items():
+            by_verb_exp[v_exp] = by_verb_exp.get(v_exp, 0) + c * noun ** n_exp
+
+        if max(by_verb_exp, default=0) <= 1:
+            c0 = by_verb_exp.get(0, 0) - expected_result
+            c1 = by_verb_exp.get(1, 0)
+            if c1 == 0:
+                if c0 == 0:
+                    return (noun, 0)
+            elif -c0 % c1 == 0 and 0 <= -c0 // c1 < 100:
+                return (noun, -c0 // c1)
+        else:
+            for verb in range(0, 100):
+                if sum(c * verb ** exp for exp, c in by_verb_exp.items()) == expected_result:
+                    return (noun, verb)
+
+    return None
 
 
 def part_1(pg: List[int]) -> int:
-    return pg_result(pg, 12, 2)
+    return pg_result(IntCodeProgram(pg, restart=False), 12, 2)
+
+
+def part_2(pg: List[int], expected_result: int, symbolic: bool = True, batch: bool = False) -> int:
+    result = parse_program_symbolic(pg) if symbolic else None
+    if result is not None:
+        found = solve_noun_verb(result, expected_result)
+        if found is None:
+            raise Exception(f"Didn't found noun and verb for expected_result: {expected_result}")
+
+        noun, verb = found
+        return 100 * noun + verb
+
+    if batch:
+        pairs = [(noun, verb) for noun in range(0, 100) for verb in range(0, 100)]
+        for (noun, verb), r in zip(pairs, pg_results_batch(pg, pairs)):
+            if r == expected_result:
+                return 100 * noun + verb
 
+        raise Exception(f"Didn't found noun and verb for expected_result: {expected_result}")
 
-def part_2(pg: List[int], expected_result: int) -> int:
+    base = IntCodeProgram(pg, restart=False)
     for noun in range(0, 100):
         for verb in range(0, 100):
-            if pg_result(pg, noun, verb) == expected_result:
+            if pg_result(base, noun, verb) == expected_result:
                 return 100 * noun + verb
 
     raise Exception(f"Didn't found noun and verb for expected_result: {expected_result}")
 
 
 if __name__ == "__main__":
-    pg: List[int] = []
-    with open('02.txt', 'r') as file:
-        pg = [int(x) for x in file.read().split(',')]
+    pg = load_program('02.txt')
 
     print(f"Part 1: {part_1(pg)}")
     print(f"Part 2: {part_2(pg, 19690720)}")
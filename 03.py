@@ -1,19 +1,46 @@
 #!/usr/bin/env python
 
-from typing import List, Tuple, Dict
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, Iterator, List, NamedTuple, TextIO, Tuple
+
+
+# Positions are packed into a single 64-bit key, 32 bits per coordinate
+COORD_BITS = 32
+COORD_OFFSET = 1 << (COORD_BITS - 1)
+
+
+def pack_position(x: int, y: int) -> int:
+    if not (-COORD_OFFSET <= x < COORD_OFFSET and -COORD_OFFSET <= y < COORD_OFFSET):
+        raise Exception(f'Position out of range: {(x, y)}')
+
+    return (x + COORD_OFFSET) << COORD_BITS | (y + COORD_OFFSET)
 
 
 class PositionMatrix:
-    x_y: Dict[int, Dict[int, Dict[int, int]]] = {}
-    cross_points: List[Tuple[int, int, int]] = []
-    node_cur_pos: Dict[int, Tuple[int, int]] = {}
-    node_acc_steps: Dict[int, int] = {}
+    cross_points: List[Tuple[int, int, int]]
+    node_cur_pos: List[Tuple[int, int]]
+    node_acc_steps: array
     num_nodes: int = 0
 
+    # Visited cells map their packed position to a slot. Slot i keeps the
+    # steps each node took to first get there in
+    # _steps[i * num_nodes:(i + 1) * num_nodes] and how many nodes got
+    # there in _visits[i].
+    _cells: Dict[int, int]
+    _steps: array
+    _visits: array
+
     def __init__(self, num_nodes: int, *args, **kwargs):
         self.num_nodes = num_nodes
-        self.node_acc_steps = {n: 0 for n in range(num_nodes)}
-        self.node_cur_pos = {n: (0, 0) for n in range(num_nodes)}
+        self.cross_points = []
+        self.node_acc_steps = array('q', [0] * num_nodes)
+        self.node_cur_pos = [(0, 0)] * num_nodes
+        self._cells = {}
+        self._steps = array('q')
+        self._visits = array('l')
 
     def get_cross_ponts(self) -> List[Tuple[int, int, int]]:
         return self.cross_points
@@ -23,30 +50,32 @@ class PositionMatrix:
             raise Exception('Bad node id')
 
         x, y = position
+        key = pack_position(x, y)
 
-        if x not in self.x_y:
-            self.x_y[x] = {}
+        self.node_acc_steps[node_id] += 1
 
-        if y not in self.x_y[x]:
-            self.x_y[x][y] = {n: 0 for n in range(self.num_nodes)}
+        slot = self._cells.get(key)
+        if slot is None:
+            slot = self._cells[key] = len(self._visits)
+            self._steps.extend(repeat(0, self.num_nodes))
+            self._visits.append(0)
 
-        already_visited = self.x_y[x][y][node_id] > 0
-
-        self.node_acc_steps[node_id] = self.node_acc_steps.get(node_id, 0) + 1
+        start = slot * self.num_nodes
+        already_visited = self._steps[start + node_id] > 0
 
         if not already_visited:
-            self.x_y[x][y][node_id] = self.node_acc_steps[node_id]
-            all_visited = all(s > 0 for s in self.x_y[x][y].values())
+            self._steps[start + node_id] = self.node_acc_steps[node_id]
+            self._visits[slot] += 1
 
-            if all_visited:
-                acc_steps = sum(self.x_y[x][y].values())
+            if self._visits[slot] == self.num_nodes:
+                acc_steps = sum(self._steps[start:start + self.num_nodes])
                 self.cross_points.append((x, y, acc_steps))
 
     def move(self, node_id: int, direction: str, steps: int) -> None:
         if node_id < 0 or node_id >= self.num_nodes:
             raise Exception('Bad node id')
 
-        cur_x, cur_y = self.node_cur_pos.get(node_id, (0, 0))
+        cur_x, cur_y = self.node_cur_pos[node_id]
 
         if direction == 'U':
             for y in range(cur_y + 1, cur_y + steps + 1):
@@ -91,20 +120,364 @@ def get_cross_ponts(cables: List[List[str]]) -> List[Tuple[int, int, int]]:
     return p_m.cross_points
 
 
+class Segment(NamedTuple):
+    '''
+    A straight run of a cable. `line` is the y of horizontal segments and
+    the x of vertical ones, `lo` and `hi` bound the other coordinate of the
+    cells it visits, which don't include `origin`, where the previous
+    segment ended. `steps` is how many steps the cable took before it.
+    '''
+    line: int
+    origin: int
+    lo: int
+    hi: int
+    steps: int
+
+    def steps_at(self, c: int) -> int:
+        return self.steps + abs(c - self.origin)
+
+
+def next_segment(position: Tuple[int, int], acc_steps: int, move: str) -> Tuple[Segment, bool, Tuple[int, int]]:
+    '''
+    Returns the segment `move` traces from `position` after `acc_steps`
+    steps, whether it is vertical and the position it ends at.
+    '''
+    x, y = position
+    direction = move[0]
+    steps = int(move[1:])
+
+    if direction == 'U':
+        return (Segment(x, y, y + 1, y + steps, acc_steps), True, (x, y + steps))
+    elif direction == 'D':
+        return (Segment(x, y, y - steps, y - 1, acc_steps), True, (x, y - steps))
+    elif direction == 'R':
+        return (Segment(y, x, x + 1, x + steps, acc_steps), False, (x + steps, y))
+    elif direction == 'L':
+        return (Segment(y, x, x - steps, x - 1, acc_steps), False, (x - steps, y))
+    else:
+        raise Exception(f'Unknown direction: {direction}')
+
+
+def trace_segments(cable_moves: List[str]) -> Tuple[List[Segment], List[Segment]]:
+    horizontal: List[Segment] = []
+    vertical: List[Segment] = []
+    position, acc_steps = (0, 0), 0
+
+    for move in cable_moves:
+        seg, is_vertical, position = next_segment(position, acc_steps, move)
+        if seg.hi >= seg.lo:
+            (vertical if is_vertical else horizontal).append(seg)
+        acc_steps += seg.hi - seg.lo + 1
+
+    return (horizontal, vertical)
+
+
+def perpendicular_crossings(horizontal: List[Segment], vertical: List[Segment]) -> Iterator[Tuple[int, int, int, int]]:
+    '''
+    Yields (x, y, horizontal steps, vertical steps) wherever a horizontal
+    segment crosses a vertical one. Sweeps over x keeping the horizontal
+    segments that span the current x sorted by y, so each vertical segment
+    only looks at the ones it actually crosses.
+    '''
+    # At the same x, segments are added before the vertical ones look for
+    # them and removed after
+    events = [(h.lo, 0, i) for i, h in enumerate(horizontal)]
+    events += [(h.hi, 2, i) for i, h in enumerate(horizontal)]
+    events += [(v.line, 1, i) for i, v in enumerate(vertical)]
+    events.sort()
+
+    active: List[Tuple[int, int]] = []
+    for x, kind, idx in events:
+        if kind == 0:
+            insort(active, (horizontal[idx].line, idx))
+        elif kind == 2:
+            del active[bisect_left(active, (horizontal[idx].line, idx))]
+        else:
+            v = vertical[idx]
+            start = bisect_left(active, (v.lo, -1))
+            end = bisect_right(active, (v.hi, len(horizontal)))
+            for y, h_idx in active[start:end]:
+                yield (x, y, horizontal[h_idx].steps_at(x), v.steps_at(y))
+
+
+def collinear_crossings(a: List[Segment], b: List[Segment]) -> Iterator[Tuple[int, int, int, int]]:
+    '''
+    Yields (line, c, a steps, b steps) for every cell where segments of `a`
+    and `b` running along the same line overlap.
+    '''
+    by_line: Dict[int, List[Segment]] = {}
+    for seg in b:
+        by_line.setdefault(seg.line, []).append(seg)
+
+    for seg in a:
+        for other in by_line.get(seg.line, ()):
+            for c in range(max(seg.lo, other.lo), min(seg.hi, other.hi) + 1):
+                yield (seg.line, c, seg.steps_at(c), other.steps_at(c))
+
+
+def segment_crossings(a_moves: List[str], b_moves: List[str]) -> Dict[Tuple[int, int], Tuple[int, int]]:
+    '''
+    Returns the cells both cables visit with the steps each cable takes to
+    first reach them. Works on whole segments, so the time depends on the
+    number of segments and crossings rather than on the length of the wires.
+    '''
+    return traced_crossings(trace_segments(a_moves), trace_segments(b_moves))
+
+
+def traced_crossings(a: Tuple[List[Segment], List[Segment]],
+                     b: Tuple[List[Segment], List[Segment]]) -> Dict[Tuple[int, int], Tuple[int, int]]:
+    a_h, a_v = a
+    b_h, b_v = b
+
+    found: List[Tuple[Tuple[int, int], int, int]] = []
+    found += [((x, y), a, b) for x, y, a, b in perpendicular_crossings(a_h, b_v)]
+    found += [((x, y), a, b) for x, y, b, a in perpendicular_crossings(b_h, a_v)]
+    found += [((c, y), a, b) for y, c, a, b in collinear_crossings(a_h, b_h)]
+    found += [((x, c), a, b) for x, c, a, b in collinear_crossings(a_v, b_v)]
+
+    # Cables can cross themselves, keep the first time each one gets there
+    crossings: Dict[Tuple[int, int], Tuple[int, int]] = {}
+    for p, a_steps, b_steps in found:
+        if p in crossings:
+            prev_a, prev_b = crossings[p]
+            a_steps, b_steps = min(a_steps, prev_a), min(b_steps, prev_b)
+        crossings[p] = (a_steps, b_steps)
+
+    return crossings
+
+
+# Segments of the first cable, traced once by each worker process when it starts
+_worker_first: Tuple[List[Segment], List[Segment]] = ([], [])
+
+
+def _init_worker(first_moves: List[str]) -> None:
+    global _worker_first
+    _worker_first = trace_segments(first_moves)
+
+
+def _first_cable_crossings(cable_moves: List[str]) -> Dict[Tuple[int, int], Tuple[int, int]]:
+    return traced_crossings(_worker_first, trace_segments(cable_moves))
+
+
+def sweep_cross_points(cables: List[List[str]], workers: int = 1) -> List[Tuple[int, int, int]]:
+    '''
+    Same cross points as get_cross_ponts, found with segment_crossings.
+    With more than two cables, the cells of the first cable crossed by
+    every other one are kept.
+
+    With more than one worker, each worker traces the first cable once and
+    then, for every other cable it is sent, traces it and returns only its
+    crossings with the first one. Moves go in and crossings come out, the
+    traced segments never cross process boundaries.
+    '''
+    if len(cables) < 2:
+        return get_cross_ponts(cables)
+
+    # A single other cable leaves nothing to share out
+    if workers <= 1 or len(cables) == 2:
+        first = trace_segments(cables[0])
+        all_crossings = [traced_crossings(first, trace_segments(c)) for c in cables[1:]]
+    else:
+        workers = min(workers, len(cables) - 1)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cables[0],)) as executor:
+            all_crossings = list(executor.map(_first_cable_crossings, cables[1:]))
+
+    # Cells of the first cable every other cable crosses. Starting from the
+    # cable with fewer crossings keeps the lookups down.
+    first = min(range(len(all_crossings)), key=lambda i: len(all_crossings[i]))
+    acc_steps: Dict[Tuple[int, int], int] = {}
+    for p, (a, b) in all_crossings[first].items():
+        for i, crossings in enumerate(all_crossings):
+            if i == first:
+                continue
+            if p not in crossings:
+                break
+            b += crossings[p][1]
+        else:
+            acc_steps[p] = a + b
+
+    return [(x, y, s) for (x, y), s in sorted(acc_steps.items())]
+
+
+# Side of the squares SegmentIndex buckets segments in, as a power of 2. Moves
+# in the puzzle inputs are up to about a thousand cells long.
+CELL_BITS = 10
+
+
+class SegmentIndex:
+    '''
+    Segments running in one direction, bucketed in squares of 2^CELL_BITS
+    cells by their line and by every stretch of the other coordinate they
+    cover. Both coordinates are indexed, so queries only look at segments
+    in the squares they ask about, and adding a segment is an append to the
+    few buckets it covers.
+    '''
+    cells: Dict[Tuple[int, int], List[Segment]]
+
+    def __init__(self):
+        self.cells = {}
+
+    def add(self, seg: Segment) -> None:
+        line_cell = seg.line >> CELL_BITS
+        for c in range(seg.lo >> CELL_BITS, (seg.hi >> CELL_BITS) + 1):
+            self.cells.setdefault((line_cell, c), []).append(seg)
+
+    def on_line(self, line: int, lo: int, hi: int) -> Iterator[Segment]:
+        '''
+        Yields the segments on `line` that overlap [lo, hi]. A segment can be
+        yielded more than once.
+        '''
+        line_cell = line >> CELL_BITS
+        for c in range(lo >> CELL_BITS, (hi >> CELL_BITS) + 1):
+            for seg in self.cells.get((line_cell, c), ()):
+                if seg.line == line and seg.lo <= hi and lo <= seg.hi:
+                    yield seg
+
+    def crossing(self, c: int, lo: int, hi: int) -> Iterator[Segment]:
+        '''
+        Yields the segments on a line within [lo, hi] that cover `c`, the
+        ones a perpendicular segment at `c` running from lo to hi crosses.
+        '''
+        c_cell = c >> CELL_BITS
+        for line_cell in range(lo >> CELL_BITS, (hi >> CELL_BITS) + 1):
+            for seg in self.cells.get((line_cell, c_cell), ()):
+                if lo <= seg.line <= hi and seg.lo <= c <= seg.hi:
+                    yield seg
+
+
+# How much text WireStream.read_from() takes from the stream at once
+CHUNK_SIZE = 1 << 16
+
+
+class WireStream:
+    '''
+    Solves day 3 for two cables as their moves arrive, so the input never
+    has to be loaded whole and the answers can be asked for at any point.
+    best_distance and best_steps are those of the crossings seen so far,
+    -1 while there are none.
+
+    Each new segment is only checked against the segments the other cable
+    already has near it, found through a SegmentIndex. Along collinear
+    overlaps the best cell is worked out instead of visiting every cell.
+    '''
+    best_distance: int
+    best_steps: int
+    cable: int
+
+    _position: List[Tuple[int, int]]
+    _acc_steps: List[int]
+    # Per cable: index of horizontal segments, index of vertical segments
+    _indexes: List[Tuple[SegmentIndex, SegmentIndex]]
+    _token: str
+
+    def __init__(self):
+        self.best_distance = -1
+        self.best_steps = -1
+        self.cable = 0
+        self._position = [(0, 0), (0, 0)]
+        self._acc_steps = [0, 0]
+        self._indexes = [(SegmentIndex(), SegmentIndex()), (SegmentIndex(), SegmentIndex())]
+        self._token = ''
+
+    def _offer(self, distance: int, steps: int) -> None:
+        if self.best_distance < 0 or distance < self.best_distance:
+            self.best_distance = distance
+        if self.best_steps < 0 or steps < self.best_steps:
+            self.best_steps = steps
+
+    def add_move(self, cable_id: int, move: str) -> None:
+        if cable_id not in (0, 1):
+            raise Exception('Bad cable id')
+
+        seg, is_vertical, self._position[cable_id] = next_segment(
+            self._position[cable_id], self._acc_steps[cable_id], move)
+        self._acc_steps[cable_id] += seg.hi - seg.lo + 1
+        if seg.hi < seg.lo:
+            return
+
+        # Segments are (line, c) in their own orientation, (c, line) is the
+        # cell for the other one. Distances don't depend on which is which.
+        parallel = self._indexes[1 - cable_id][is_vertical]
+        crossing = self._indexes[1 - cable_id][not is_vertical]
+
+        for other in crossing.crossing(seg.line, seg.lo, seg.hi):
+            self._offer(
+                abs(seg.line) + abs(other.line),
+                seg.steps_at(other.line) + other.steps_at(seg.line),
+            )
+
+        # Segments covering several squares can come up more than once, which
+        # is harmless as only the best values are kept
+        for other in parallel.on_line(seg.line, seg.lo, seg.hi):
+            lo, hi = max(seg.lo, other.lo), min(seg.hi, other.hi)
+            # The distance and the sum of both step counts are piecewise
+            # linear along the overlap, their minimums are at the ends or
+            # where one of the segments starts
+            nearest = min(max(0, lo), hi)
+            self._offer(
+                abs(seg.line) + abs(nearest),
+                min(
+                    seg.steps_at(c) + other.steps_at(c)
+                    for c in (lo, hi, min(max(seg.origin, lo), hi), min(max(other.origin, lo), hi))
+                ),
+            )
+
+        self._indexes[cable_id][is_vertical].add(seg)
+
+    def feed(self, text: str) -> None:
+        '''
+        Takes the next piece of input text. Moves are separated by commas and
+        each line is a cable. A move split between two pieces is completed by
+        the next one.
+        '''
+        for line_idx, line in enumerate(text.split('\n')):
+            if line_idx > 0:
+                self._end_move()
+                self.cable += 1
+
+            tokens = line.split(',')
+            self._token += tokens[0]
+            for token in tokens[1:]:
+                self._end_move()
+                self._token = token
+
+    def _end_move(self) -> None:
+        move = self._token.strip()
+        self._token = ''
+        if move:
+            self.add_move(self.cable, move)
+
+    def close(self) -> None:
+        self._end_move()
+
+    def read_from(self, stream: TextIO, chunk_size: int = CHUNK_SIZE) -> None:
+        '''
+        Feeds everything that can be read from `stream`, a file or anything
+        like it, such as a socket from makefile('r').
+        '''
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            self.feed(chunk)
+
+        self.close()
+
+
 def get_manhattan_distances(origin: Tuple[int,int], points: List[Tuple[int, int, int]]) -> List[int]:
     return [abs(origin[0] - p[0]) + abs(origin[1] - p[1]) for p in points]
 
 
-def part_1(cables: List[List[str]]) -> int:
-    cp = get_cross_ponts(cables)
+def part_1(cables: List[List[str]], sweep: bool = True, workers: int = 1) -> int:
+    cp = sweep_cross_points(cables, workers) if sweep else get_cross_ponts(cables)
     if not cp:
         return -1
 
     return min(get_manhattan_distances((0, 0), cp))
 
 
-def part_2(cables: List[List[str]]) -> int:
-    cp = get_cross_ponts(cables)
+def part_2(cables: List[List[str]], sweep: bool = True, workers: int = 1) -> int:
+    cp = sweep_cross_points(cables, workers) if sweep else get_cross_ponts(cables)
     if not cp:
         return -1
 
@@ -1,289 +1,156 @@
 #!/usr/bin/env python
 
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from itertools import permutations
-from typing import List, Tuple, Dict
-
-
-class IntCodeProgram:
-    program: List[str]
-    restart: bool
-    debug: bool
-
-    _inputs: List[str]
-    _pg: List[str]
-    _pointer = 0
-    _outputs: List[str]
-
-    def __init__(self, program: List[str], restart=True, debug=False):
-        self.program = program.copy()
-        self._pg = program.copy()
-        self._inputs = []
-        self.restart = restart
-        self.debug = debug
-
-        self.opcodes = {
-            '1': self._opcode_1,
-            '2': self._opcode_2,
-            '3': self._opcode_3,
-            '4': self._opcode_4,
-            '5': self._opcode_5,
-            '6': self._opcode_6,
-            '7': self._opcode_7,
-            '8': self._opcode_8,
-        }
-
-    def __str__(self):
-        return f'''
-        Program:
-        {'  '.join(self._pg)}
-        {'  '.join(['*' if i is self._pointer else ' ' * len(x) for i, x in enumerate(self._pg)])}
-
-        Inputs:
-        {self._inputs}
-
-        Outputs:
-        {self._outputs}
-        '''
-
-    def _val_mode(self, pos: int, mode: str) -> str:
-        val = self._pg[pos]
-        if mode == "0":
-            return self._pg[int(val)]
-        elif mode == "1":
-            return val
-        else:
-            raise Exception(f"Unknown mode: {mode}")
-
-    def _get_mode_params(self, num_params: int) -> str:
-        code_seq = self._pg[self._pointer]
-        code_seq = ("0" * (5-len(code_seq))) + code_seq
-
-        return code_seq[:3][::-1][:num_params]
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
 
-    '''
-    Opcode 1 adds together numbers read from two positions and stores
-    the result in a third position. The three integers immediately after
-    the opcode tell you these three positions.
-    '''
-    def _opcode_1(self):
-        m1, m2, _m3 = self._get_mode_params(3)
-        val1 = self._val_mode(self._pointer+1, m1)
-        val2 = self._val_mode(self._pointer+2, m2)
-        w_result_pos = int(self._pg[self._pointer+3])
+from intcode import IntCodeProgram, Network, load_program, run_pipeline
 
-        self._pg[w_result_pos] = str(int(val1)+int(val2))
-        self._pointer += 4
 
-    '''
-    Opcode 2 multiplies together numbers read from two positions and stores
-    the result in a third position. The three integers immediately after
-    the opcode tell you these three positions.
-    '''
-    def _opcode_2(self):
-        m1, m2, _m3 = self._get_mode_params(3)
-        val1 = self._val_mode(self._pointer+1, m1)
-        val2 = self._val_mode(self._pointer+2, m2)
-        w_result_pos = int(self._pg[self._pointer+3])
-
-        self._pg[w_result_pos] = str(int(val1)*int(val2))
-        self._pointer += 4
-
-    '''
-    Opcode 3 takes a single integer as input and saves it to the position
-    given by its only parameter. For example, the instruction 3,50 would
-    take an input value and store it at address 50.
-    '''
-    def _opcode_3(self):
-        if not self._inputs:
-            raise Exception(f"No remaining inputs")
+# (phase, input signal) -> output signal for one program. An amplifier always
+# starts from a fresh copy of the program, so its output depends on nothing else
+StageCache = Dict[Tuple[int, int], int]
 
-        _inp = self._inputs.pop(0)
 
-        w_result_pos = int(self._pg[self._pointer+1])
-        self._pg[w_result_pos] = _inp
-        self._pointer += 2
+def amplifier_output(pg: IntCodeProgram, phase: int, signal: int, cache: StageCache) -> int:
+    key = (phase, signal)
+    if key not in cache:
+        # Every amplifier starts as a fork of `pg`, so if it was already run up
+        # to its first input that part is not executed again
+        amp = pg.fork()
+        amp.add_inputs(phase, signal)
+        cache[key], _halted = amp.output()
 
-    '''
-    Opcode 4 outputs the value of its only parameter.
-    For example, the instruction 4,50 would output the value at address 50.
-    '''
-    def _opcode_4(self):
-        m = self._get_mode_params(1)
-        val = self._val_mode(self._pointer+1, m)
-        self._outputs.append(val)
+    return cache[key]
 
-        self._pointer += 2
 
-    '''
-    Opcode 5 is jump-if-true: if the first parameter is non-zero, it sets
-    the instruction pointer to the value from the second parameter.
-    Otherwise, it does nothing.
-    '''
-    def _opcode_5(self):
-        m1, m2 = self._get_mode_params(2)
-        val1 = self._val_mode(self._pointer+1, m1)
-        val2 = self._val_mode(self._pointer+2, m2)
+def calculate_thruster_signal(pg: IntCodeProgram, phase_settings: List[int], cache: Optional[StageCache] = None) -> int:
+    # Callers evaluating many settings of the same program can share a cache
+    if cache is None:
+        cache = {}
 
-        if int(val1) != 0:
-            self._pointer = int(val2)
-        else:
-            self._pointer += 3
+    signal = 0
+    for p in phase_settings:
+        signal = amplifier_output(pg, p, signal, cache)
 
-    '''
-    Opcode 6 is jump-if-false: if the first parameter is zero, it sets
-    the instruction pointer to the value from the second parameter.
-    Otherwise, it does nothing.
-    '''
-    def _opcode_6(self):
-        m1, m2 = self._get_mode_params(2)
-        val1 = self._val_mode(self._pointer+1, m1)
-        val2 = self._val_mode(self._pointer+2, m2)
+    return signal
 
-        if int(val1) == 0:
-            self._pointer = int(val2)
-        else:
-            self._pointer += 3
 
+def max_thruster_signal(pg: IntCodeProgram, phases: List[int]) -> int:
     '''
-    Opcode 7 is less than: if the first parameter is less than the second
-    parameter, it stores 1 in the position given by the third parameter.
-    Otherwise, it stores 0.
+    Returns the best signal over every ordering of `phases`. Orderings are
+    walked as a prefix tree, so a shared prefix is evaluated once, and the
+    best result is memoized by (input signal, phases left). Two prefixes
+    that use the same phases and reach the same signal share one subtree.
     '''
-    def _opcode_7(self):
-        m1, m2, _m3 = self._get_mode_params(3)
-        val1 = self._val_mode(self._pointer+1, m1)
-        val2 = self._val_mode(self._pointer+2, m2)
-        w_result_pos = int(self._pg[self._pointer+3])
+    cache: StageCache = {}
+    best: Dict[Tuple[int, FrozenSet[int]], int] = {}
 
-        if int(val1) < int(val2):
-            self._pg[w_result_pos] = '1'
-        else:
-            self._pg[w_result_pos] = '0'
+    def search(signal: int, remaining: FrozenSet[int]) -> int:
+        if not remaining:
+            return signal
 
-        self._pointer += 4
+        key = (signal, remaining)
+        if key not in best:
+            best[key] = max(
+                search(amplifier_output(pg, phase, signal, cache), remaining - {phase})
+                for phase in remaining
+            )
 
-    '''
-    Opcode 8 is equals: if the first parameter is equal to the second parameter,
-    it stores 1 in the position given by the third parameter.
-    Otherwise, it stores 0.
-    '''
-    def _opcode_8(self):
-        m1, m2, _m3 = self._get_mode_params(3)
-        val1 = self._val_mode(self._pointer+1, m1)
-        val2 = self._val_mode(self._pointer+2, m2)
-        w_result_pos = int(self._pg[self._pointer+3])
+        return best[key]
 
-        if int(val1) == int(val2):
-            self._pg[w_result_pos] = '1'
-        else:
-            self._pg[w_result_pos] = '0'
+    return search(0, frozenset(phases))
 
-        self._pointer += 4
 
-    def add_inputs(self, *inputs: int) -> None:
-        self._inputs += [str(x) for x in inputs]
+async def run_feedback_loop(pg: List[int], phase_settings: List[int]) -> int:
+    # Amplifier i reads from channel i and writes to channel i+1, the last
+    # one feeding back into the first
+    channels: List[asyncio.Queue] = [asyncio.Queue() for _ in phase_settings]
+    for c, phase in zip(channels, phase_settings):
+        c.put_nowait(phase)
 
-    def _get_output(self) -> int:
-        if not self._outputs:
-            return 0
-        else:
-            return int(self._outputs[-1])
+    channels[0].put_nowait(0)
 
-    def output(self) -> Tuple[int, bool]:
-        halted = False
-        self._outputs = []
+    amplifiers = [
+        IntCodeProgram(pg, restart=False).run_async(c, channels[(idx + 1) % len(channels)])
+        for idx, c in enumerate(channels)
+    ]
+    signals = await asyncio.gather(*amplifiers)
 
-        if self.restart:
-            self._pointer = 0
-            self._pg = self.program.copy()
+    return signals[-1]
 
-        if self.debug:
-            print(self)
-            input("Press enter to continue")
 
-        while self._pointer < len(self._pg):
-            code_seq = self._pg[self._pointer]
-            if code_seq == "99":
-                halted = True
-                break
+def calculate_thruster_signal_feedback_loop(pg: List[int], phase_settings: List[int]) -> int:
+    network = Network()
+    for idx, phase in enumerate(phase_settings):
+        network.add_node(idx, IntCodeProgram(pg, restart=False))
+        network.send(idx, phase)
 
-            if code_seq[-1] == '3' and not self._inputs:
-                return (self._get_output(), halted)
+    for idx in range(len(phase_settings)):
+        network.connect(idx, (idx + 1) % len(phase_settings))
 
-            try:
-                run_opcode = self.opcodes[code_seq[-1]]
-            except KeyError:
-                raise Exception(
-                    f"Unknown operation at position ({self._pointer}): {code_seq}")
+    network.send(0, 0)
+    network.run()
 
-            run_opcode()
+    return network.last_outputs[len(phase_settings) - 1]
 
-            if self.debug:
-                print(self)
-                input("Press enter to continue")
 
-        if not self._outputs:
-            return (0, halted)
+def calculate_thruster_signal_multicore(pg: List[int], phase_settings: List[int], feedback: bool = True) -> int:
+    # One OS process per amplifier, connected by shared-memory ring buffers
+    stage_inputs = [[phase] for phase in phase_settings]
+    stage_inputs[0].append(0)
 
-        return (int(self._outputs[-1]), halted)
+    return run_pipeline(pg, stage_inputs, loop=feedback)
 
 
-def calculate_thruster_signal(pg: IntCodeProgram, phase_settings: List[int]) -> int:
-    signal = 0
-    for p in phase_settings:
-        pg.add_inputs(p, signal)
-        signal, _halted = pg.output()
-
-    return signal
+# Program each worker process evaluates, shipped once when the worker starts
+_worker_program: List[int] = []
 
 
-def calculate_thruster_signal_feedback_loop(pg: List[str], phase_settings: List[int]) -> int:
-    programs = [IntCodeProgram(pg, restart=False) for i in range(5)]
-    for p, phase in zip(programs, phase_settings):
-        p.add_inputs(phase)
+def _init_worker(program: List[int]) -> None:
+    global _worker_program
+    _worker_program = program
 
-    signal = 0
-    halted = False
 
-    while not halted:
-        for idx, p in enumerate(programs):
-            p.add_inputs(signal)
-            signal, h = p.output()
+def _best_feedback_loop_signal(phase_settings_chunk: Sequence[Tuple[int, ...]]) -> int:
+    return max(calculate_thruster_signal_feedback_loop(_worker_program, list(p)) for p in phase_settings_chunk)
 
-            if h:
-                halted = True
 
-    return signal
+def part_1(program: List[int]) -> int:
+    pg = IntCodeProgram(program=program, restart=False)
+    pg.output()
 
+    return max_thruster_signal(pg, [0, 1, 2, 3, 4])
 
-def part_1(program: List[str]) -> int:
-    pg = IntCodeProgram(program=program)
 
-    max_signal = 0
-    for phase_settings in permutations([0, 1, 2, 3, 4]):
-        signal = calculate_thruster_signal(pg, list(phase_settings))
-        if signal > max_signal:
-            phase_settings_max = list(phase_settings)
-            max_signal = signal
+def part_2(program: List[int], workers: int = 1) -> int:
+    if workers <= 1:
+        max_signal = 0
+        for phase_settings in permutations([5, 6, 7, 8, 9]):
+            signal = calculate_thruster_signal_feedback_loop(program, list(phase_settings))
+            if signal > max_signal:
+                phase_settings_max = list(phase_settings)
+                max_signal = signal
 
-    return max_signal
+        return max_signal
 
+    # A few shards per worker keep them all busy until the end
+    all_settings = list(permutations([5, 6, 7, 8, 9]))
+    num_shards = workers * 4
+    shards = [all_settings[i::num_shards] for i in range(num_shards)]
 
-def part_2(program: List[str]) -> int:
     max_signal = 0
-    for phase_settings in permutations([5, 6, 7, 8, 9]):
-        signal = calculate_thruster_signal_feedback_loop(pg, list(phase_settings))
-        if signal > max_signal:
-            phase_settings_max = list(phase_settings)
-            max_signal = signal
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(program,)) as executor:
+        futures = [executor.submit(_best_feedback_loop_signal, s) for s in shards if s]
+        for f in as_completed(futures):
+            max_signal = max(max_signal, f.result())
 
     return max_signal
 
 
 if __name__ == "__main__":
-    pg: List[str] = []
-    with open('07.txt', 'r') as file:
-        pg = [x for x in file.read().replace('\n', '').split(',')]
+    pg = load_program('07.txt')
 
     print(f"Part 1: {part_1(pg)}")
     print(f"Part 2: {part_2(pg)}")
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from days import ROOT, load_day
+from intcode import load_program
+from intcode_bench import loop_program
+
+
+# Slower than the baseline by more than this fraction counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+# Timings below this are mostly noise, they are never flagged
+MIN_SECONDS = 0.01
+
+
+class Workload(NamedTuple):
+    day: str
+    part: int
+    input: str
+    args: Callable[[], Tuple[Any, ...]]
+
+
+def read_lines(day: str) -> List[str]:
+    with open(os.path.join(ROOT, f'{day}.txt'), 'r') as file:
+        return file.read().splitlines()
+
+
+def shipped_inputs() -> Dict[str, Callable[[], Tuple[Any, ...]]]:
+    '''
+    Arguments each day's part_1 takes for the inputs in the repo, parsed the
+    way the day's __main__ does it.
+    '''
+    program = lambda day: (load_program(os.path.join(ROOT, f'{day}.txt')),)
+
+    return {
+        '01': lambda: ([int(x) for x in read_lines('01')],),
+        '02': lambda: program('02'),
+        '03': lambda: ([x.split(',') for x in read_lines('03')],),
+        '04': lambda: (172930, 683082),
+        '05': lambda: program('05'),
+        '06': lambda: (read_lines('06'),),
+        '07': lambda: program('07'),
+        '08': lambda: ([int(x) for x in ''.join(read_lines('08'))],),
+        '09': lambda: program('09'),
+    }
+
+
+'''
+Generators for inputs of 10^magnitude elements: modules, wire segments,
+passwords, orbits, pixels or executed Intcode instructions. They are seeded
+with the magnitude, so every run measures the same inputs.
+'''
+def gen_modules(magnitude: int) -> Tuple[Any, ...]:
+    rnd = random.Random(magnitude)
+    return ([rnd.randint(50000, 150000) for _ in range(10 ** magnitude)],)
+
+
+def gen_wires(magnitude: int) -> Tuple[Any, ...]:
+    rnd = random.Random(magnitude)
+    cables = []
+    for _ in range(2):
+        # Alternate horizontal and vertical moves, like the puzzle input does
+        moves = []
+        for i in range(10 ** magnitude):
+            direction = rnd.choice('UD' if i % 2 else 'RL')
+            moves.append(f'{direction}{rnd.randint(1, 1000)}')
+        cables.append(moves)
+
+    return (cables,)
+
+
+def gen_passwords(magnitude: int) -> Tuple[Any, ...]:
+    return (100000, min(999999, 100000 + 10 ** magnitude - 1))
+
+
+def gen_orbits(magnitude: int) -> Tuple[Any, ...]:
+    rnd = random.Random(magnitude)
+    names = ['COM'] + [f'N{i}' for i in range(1, 10 ** magnitude - 1)]
+    # Only N1 orbits COM, so YOU and SAN always share an object other than COM
+    orbits = ['COM)N1'] + [f'{names[rnd.randrange(1, i)]}){names[i]}' for i in range(2, len(names))]
+    orbits.append(f'{names[rnd.randrange(1, len(names))]})YOU')
+    orbits.append(f'{names[rnd.randrange(1, len(names))]})SAN')
+
+    return (orbits,)
+
+
+def gen_pixels(magnitude: int) -> Tuple[Any, ...]:
+    rnd = random.Random(magnitude)
+    area = 25 * 6
+    # Whole layers only, and at least one
+    layers = max(1, 10 ** magnitude // area)
+    return ([rnd.choice((0, 1, 2)) for _ in range(layers * area)],)
+
+
+def gen_intcode(magnitude: int) -> Tuple[Any, ...]:
+    # The loop runs six instructions per iteration
+    program, _ = loop_program('add/mul', max(1, 10 ** magnitude // 6))
+    return (program,)
+
+
+# Days with generated inputs and the largest magnitude they are meant to be
+# measured at. Days 02 and 07 search over a fixed program, they only run on
+# the shipped inputs.
+GENERATORS: Dict[str, Tuple[Callable[[int], Tuple[Any, ...]], int]] = {
+    '01': (gen_modules, 7),
+    '03': (gen_wires, 5),
+    '04': (gen_passwords, 6),
+    '05': (gen_intcode, 9),
+    '06': (gen_orbits, 6),
+    '08': (gen_pixels, 8),
+    '09': (gen_intcode, 9),
+}
+
+EXTRA_ARGS: Dict[Tuple[str, int], Tuple[Any, ...]] = {
+    ('02', 2): (19690720,),
+}
+
+
+def workloads(days: List[str], min_magnitude: int, max_magnitude: int) -> Iterator[Workload]:
+    shipped = shipped_inputs()
+    for day in days:
+        for part in (1, 2):
+            extra = EXTRA_ARGS.get((day, part), ())
+            yield Workload(day, part, 'shipped', lambda day=day, extra=extra: shipped[day]() + extra)
+
+            if day not in GENERATORS:
+                continue
+
+            gen, day_max = GENERATORS[day]
+            for magnitude in range(min_magnitude, min(day_max, max_magnitude) + 1):
+                yield Workload(day, part, f'1e{magnitude}', lambda gen=gen, m=magnitude: gen(m))
+
+
+def measure(workload: Workload, repeat: int) -> Dict[str, Any]:
+    args = workload.args()
+
+    timings = []
+    for _ in range(repeat):
+        module = load_day(workload.day)
+        run_part = getattr(module, f'part_{workload.part}')
+
+        start = time.perf_counter()
+        run_part(*args)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        'day': workload.day,
+        'part': workload.part,
+        'input': workload.input,
+        'seconds': min(timings),
+        'timings': timings,
+    }
+
+
+def find_regressions(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+                     threshold: float) -> List[Dict[str, Any]]:
+    '''
+    Compares the best timing of each workload with the baseline run of the
+    same workload. Workloads that are new or missing on either side are
+    ignored.
+    '''
+    previous = {(r['day'], r['part'], r['input']): r['seconds'] for r in baseline}
+
+    regressions = []
+    for r in results:
+        before = previous.get((r['day'], r['part'], r['input']))
+        if before is None or r['seconds'] < MIN_SECONDS:
+            continue
+
+        if r['seconds'] > before * (1 + threshold):
+            regressions.append({
+                'day': r['day'],
+                'part': r['part'],
+                'input': r['input'],
+                'baseline': before,
+                'seconds': r['seconds'],
+                'ratio': r['seconds'] / before,
+            })
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Times part_1 and part_2 of every day.')
+    parser.add_argument('days', nargs='*', default=[f'{d:02}' for d in range(1, 10)])
+    parser.add_argument('--min-magnitude', type=int, default=2)
+    parser.add_argument('--max-magnitude', type=int, default=3,
+                        help='largest generated input, as a power of 10 (capped per day)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--output', help='where to write the JSON results (default: stdout)')
+    args = parser.parse_args(argv)
+
+    results = []
+    for workload in workloads(args.days, args.min_magnitude, args.max_magnitude):
+        result = measure(workload, args.repeat)
+        results.append(result)
+        print(f"{result['day']} part {result['part']} {result['input']:>8}: {result['seconds']:.4f}s", file=sys.stderr)
+
+    report: Dict[str, Any] = {'results': results}
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)['results']
+        report['threshold'] = args.threshold
+        report['regressions'] = find_regressions(results, baseline, args.threshold)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,21 @@
+import importlib.util
+import os
+import sys
+from types import ModuleType
+
+
+# The repo root, where the day modules and their inputs live
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_day(day: str) -> ModuleType:
+    # Day modules start with a digit, so they can't be imported by name.
+    # Loading them again for every call also drops the state some of them
+    # keep at module or class level.
+    spec = importlib.util.spec_from_file_location(f'day_{day}', os.path.join(ROOT, f'{day}.py'))
+    module = importlib.util.module_from_spec(spec)
+    # Worker processes find the functions they are sent through sys.modules
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+
+    return module
@@ -0,0 +1,1254 @@
+import hashlib
+import mmap
+import multiprocessing
+import os
+import sys
+import time
+from array import array
+from collections import deque
+from enum import Enum
+from multiprocessing.connection import wait
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Deque, Dict, Generator, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Protocol, Sequence, Set, TextIO, Tuple, Union
+
+
+# (opcode, handler, parameter modes, instruction length). Handlers are plain
+# functions taking the machine as first argument, so decoded instructions can
+# be shared between forks.
+Instruction = Tuple[int, Optional[Callable[..., None]], Tuple[int, ...], int]
+
+INSTRUCTION_LENGTHS = {1: 4, 2: 4, 3: 2, 4: 2, 5: 3, 6: 3, 7: 4, 8: 4, 9: 2}
+
+# Memory is split in pages of PAGE_SIZE cells. Pages are allocated lazily on
+# first write and shared copy-on-write between snapshots and forks.
+PAGE_BITS = 12
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+
+# Stands in for pages that were never written, it must never be modified
+ZERO_PAGE = [0] * PAGE_SIZE
+
+# Compiled basic blocks run from the address they were compiled for and return
+# True when their last instruction produced an output
+Block = Callable[['IntCodeProgram'], bool]
+
+# Number of times the interpreter has to reach an address before the basic
+# block starting there gets compiled
+HOT_THRESHOLD = 2
+
+# Blocks dropped this many times because their code was overwritten are left to
+# the interpreter for good, so self-modifying loops don't recompile every pass
+MAX_RECOMPILES = 3
+
+# Straight-line instructions a basic block is made of, and the ones that end it
+BLOCK_BODY = {1, 2, 7, 8, 9}
+BLOCK_END = {4, 5, 6}
+
+# Opcodes whose last parameter is the address they write to
+WRITING_OPCODES = {1, 2, 3, 7, 8}
+
+# Number of entries kept by the tracer attached in debug mode
+DEFAULT_TRACE_SIZE = 100
+
+# Slots in each shared-memory ring connecting pipeline stages, and the number
+# of empty polls before a waiting stage starts sleeping between them
+RING_CAPACITY = 1024
+RING_SPINS = 1000
+
+OPCODE_CLASSES = {
+    1: 'arithmetic',
+    2: 'arithmetic',
+    3: 'io',
+    4: 'io',
+    5: 'jump',
+    6: 'jump',
+    7: 'compare',
+    8: 'compare',
+    9: 'relative base',
+}
+
+
+# Where load_program() keeps binary images of the programs it parsed, relative
+# to the program file
+CACHE_DIR = '.intcode-cache'
+
+# Cells at the start of a cached image: size and modification time of the
+# program file it was parsed from, and number of program cells that follow
+IMAGE_HEADER = 3
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+
+def _file_stamp(stat: os.stat_result) -> Tuple[int, int]:
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def load_program(path: str, cache_dir: Optional[str] = None) -> Sequence[int]:
+    '''
+    Reads a comma-separated Intcode program. The parsed program is stored
+    as a raw int64 image, tagged with the size and modification time of the
+    file. While those stay the same, loading only stats the file and
+    memory-maps the image, without reading or parsing the text.
+
+    Programs that fit in int64 are returned as an array('q'), copied out of
+    the mapping in one go, which IntCodeProgram turns into pages without
+    converting values one by one in Python. Programs with larger values are
+    returned as a list and parsed every time.
+
+    The cache is best-effort: images that can't be read or don't match the
+    file are parsed again, and images that can't be written are skipped.
+    '''
+    stamp = _file_stamp(os.stat(path))
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+
+    path_hash = hashlib.blake2b(os.path.abspath(path).encode(), digest_size=8).hexdigest()
+    image_path = os.path.join(cache_dir, f'{os.path.basename(path)}.{path_hash}.bin')
+    try:
+        with open(image_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as image:
+            with memoryview(image) as view, view.cast('q') as cells:
+                # A stale or truncated image is as good as a missing one
+                if (len(cells) >= IMAGE_HEADER and (cells[0], cells[1]) == stamp
+                        and cells[2] == len(cells) - IMAGE_HEADER):
+                    program = array('q')
+                    with view[cells.itemsize * IMAGE_HEADER:] as body:
+                        program.frombytes(body)
+                    return program
+    except (OSError, ValueError, TypeError):
+        # ValueError: an empty image can't be mapped. TypeError: its size
+        # isn't a whole number of cells.
+        pass
+
+    with open(path, 'rb') as file:
+        text = file.read()
+        fresh = _file_stamp(os.fstat(file.fileno())) == stamp
+
+    values = [int(x) for x in text.split(b',')]
+    try:
+        program = array('q', values)
+    except OverflowError:
+        return values
+
+    # A file changed while it was read could be cached under the wrong stamp
+    if not fresh:
+        return program
+
+    tmp_path = f'{image_path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp_path, 'wb') as file:
+            file.write(array('q', [*stamp, len(program)]).tobytes())
+            file.write(program.tobytes())
+        os.replace(tmp_path, image_path)
+    except OSError:
+        # Read-only checkouts and the like just go without the cache
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    return program
+
+
+class Snapshot(NamedTuple):
+    pages: Dict[int, List[int]]
+    size: int
+    pointer: int
+    base: int
+    inputs: Tuple[int, ...]
+    outputs: Tuple[int, ...]
+
+
+class Status(Enum):
+    BUDGET_EXHAUSTED = 'budget exhausted'
+    NEEDS_INPUT = 'needs input'
+    HALTED = 'halted'
+
+
+class Channel(Protocol):
+    async def get(self) -> int: ...
+
+    async def put(self, item: int) -> None: ...
+
+
+def _read_expr(mode: int, param: int) -> str:
+    if mode == 0:
+        return f'pages.get({param >> PAGE_BITS}, ZERO_PAGE)[{param & PAGE_MASK}]'
+    elif mode == 1:
+        return str(param)
+    elif mode == 2:
+        return f'pages.get((base + {param}) >> {PAGE_BITS}, ZERO_PAGE)[(base + {param}) & {PAGE_MASK}]'
+    else:
+        raise Exception(f"Unknown mode reading value: {mode}")
+
+
+def compile_block(pg: 'IntCodeProgram', entry: int) -> Optional[Tuple[Block, int]]:
+    '''
+    Generates a Python function running the basic block that starts at
+    `entry`: a run of add, multiply, compare and relative base instructions,
+    optionally closed by an output or a jump. Parameters are read from memory
+    now and baked into the code, so the caller has to drop the block as soon
+    as any cell in [entry, end) is overwritten.
+
+    Returns the function and the end address, or None if there is nothing
+    worth compiling at `entry`.
+    '''
+    lines = ['pages = pg._pages', 'write = pg._set_value', 'base = pg._base']
+    pos = entry
+    exit_at: Optional[int] = None
+    jumps = False
+    returns = 'False'
+
+    while True:
+        op = pg._get_value(pos)
+        opcode = op % 100
+        if opcode not in BLOCK_BODY and opcode not in BLOCK_END:
+            break
+
+        length = INSTRUCTION_LENGTHS[opcode]
+        modes = (op // 100 % 10, op // 1000 % 10, op // 10000 % 10)[:length-1]
+        params = [pg._get_value(pos+i) for i in range(1, length)]
+        nxt = pos + length
+
+        if opcode == 9:
+            lines.append(f'base += {_read_expr(modes[0], params[0])}')
+        elif opcode in (1, 2, 7, 8):
+            a = _read_expr(modes[0], params[0])
+            b = _read_expr(modes[1], params[1])
+            value = {
+                1: f'{a} + {b}',
+                2: f'{a} * {b}',
+                7: f'1 if {a} < {b} else 0',
+                8: f'1 if {a} == {b} else 0',
+            }[opcode]
+
+            if modes[2] == 0:
+                lines.append(f'write({params[2]}, {value})')
+                if params[2] >= nxt:
+                    # The block rewrites code it hasn't run yet, leave the
+                    # rest to the interpreter
+                    exit_at = nxt
+            elif modes[2] == 2:
+                lines.append(f'addr = base + {params[2]}')
+                lines.append(f'write(addr, {value})')
+                lines.append(f'if {nxt} <= addr < __end__:')
+                lines.append(f'    pg._base = base')
+                lines.append(f'    pg._pointer = {nxt}')
+                lines.append(f'    return False')
+            else:
+                raise Exception(f"Unknown mode for write position: {modes[2]}")
+        elif opcode == 4:
+            lines.append(f'pg._outputs.append({_read_expr(modes[0], params[0])})')
+            exit_at = nxt
+            returns = 'True'
+        else:
+            cond = '!=' if opcode == 5 else '=='
+            a = _read_expr(modes[0], params[0])
+            b = _read_expr(modes[1], params[1])
+            lines.append(f'pg._pointer = {b} if {a} {cond} 0 else {nxt}')
+            jumps = True
+
+        pos = nxt
+        if jumps or exit_at is not None:
+            break
+
+    if pos == entry:
+        return None
+
+    if not jumps:
+        lines.append(f'pg._pointer = {pos}')
+
+    lines.append('pg._base = base')
+    lines.append(f'return {returns}')
+
+    source = 'def block(pg):\n' + ''.join(f'    {line}\n' for line in lines)
+    source = source.replace('__end__', str(pos))
+
+    namespace = {'ZERO_PAGE': ZERO_PAGE}
+    exec(compile(source, f'<intcode block {entry}>', 'exec'), namespace)
+
+    return (namespace['block'], pos)
+
+
+class TraceEntry(NamedTuple):
+    pointer: int
+    opcode: int
+    operands: Tuple[int, ...]
+    write_pos: Optional[int]
+    write_value: Optional[int]
+
+    def __str__(self) -> str:
+        line = f'{self.pointer:>8}: {self.opcode:>2} {OPCODE_CLASSES[self.opcode]:<14} {list(self.operands)}'
+        if self.write_pos is not None:
+            line += f' -> [{self.write_pos}] = {self.write_value}'
+
+        return line
+
+
+class Tracer:
+    '''
+    Keeps the last `size` executed instructions in a ring buffer, with the
+    operand values they read and the cell they wrote. Recording an entry
+    costs the same whatever the size of memory, and the buffer is dumped
+    when the machine raises.
+    '''
+    entries: Deque[TraceEntry]
+
+    def __init__(self, size: int):
+        self.entries = deque(maxlen=size)
+
+    def wrap(self, opcode: int, run_opcode: Callable[..., None]) -> Callable[..., None]:
+        entries = self.entries
+        num_reads = INSTRUCTION_LENGTHS[opcode] - 1 - (1 if opcode in WRITING_OPCODES else 0)
+
+        def traced(pg: 'IntCodeProgram', pos: int, *modes: int) -> None:
+            operands = tuple(pg._val_mode(pos+1+i, modes[i]) for i in range(num_reads))
+            write_pos: Optional[int] = None
+            if opcode in WRITING_OPCODES:
+                write_pos = pg._get_write_pos(pos+1+num_reads, modes[num_reads])
+
+            try:
+                run_opcode(pg, pos, *modes)
+            finally:
+                write_value = pg._get_value(write_pos) if write_pos is not None else None
+                entries.append(TraceEntry(pos, opcode, operands, write_pos, write_value))
+
+        return traced
+
+    def format(self) -> str:
+        return '\n'.join(str(e) for e in self.entries)
+
+    def dump(self, file: Optional[TextIO] = None) -> None:
+        # Looked up on every call, so redirecting sys.stderr also redirects dumps
+        if file is None:
+            file = sys.stderr
+
+        print(f'Last {len(self.entries)} executed instructions:', file=file)
+        print(self.format(), file=file)
+
+
+class Profiler:
+    '''
+    Collects execution counts per opcode and per address, time spent per
+    opcode class and memory high-water marks. Handlers are only wrapped when
+    an instruction is decoded with a profiler attached, so machines without
+    one run exactly the same dispatch loop as before.
+    '''
+    opcode_counts: Dict[int, int]
+    address_counts: Dict[int, int]
+    class_times: Dict[str, float]
+    max_size: int
+    max_pages: int
+
+    def __init__(self):
+        self.opcode_counts = {}
+        self.address_counts = {}
+        self.class_times = {}
+        self.max_size = 0
+        self.max_pages = 0
+
+    def wrap(self, opcode: int, run_opcode: Callable[..., None]) -> Callable[..., None]:
+        op_class = OPCODE_CLASSES[opcode]
+        opcode_counts = self.opcode_counts
+        address_counts = self.address_counts
+        class_times = self.class_times
+
+        def profiled(pg: 'IntCodeProgram', pos: int, *modes: int) -> None:
+            start = time.perf_counter()
+            run_opcode(pg, pos, *modes)
+            elapsed = time.perf_counter() - start
+
+            opcode_counts[opcode] = opcode_counts.get(opcode, 0) + 1
+            address_counts[pos] = address_counts.get(pos, 0) + 1
+            class_times[op_class] = class_times.get(op_class, 0.0) + elapsed
+
+            if pg._size > self.max_size:
+                self.max_size = pg._size
+            if len(pg._pages) > self.max_pages:
+                self.max_pages = len(pg._pages)
+
+        return profiled
+
+    def hot_addresses(self, n: int = 10) -> List[Tuple[int, int]]:
+        return sorted(self.address_counts.items(), key=lambda x: x[1], reverse=True)[:n]
+
+    def report(self, n: int = 10) -> str:
+        total = sum(self.opcode_counts.values())
+        lines = [f'Instructions executed: {total}', '', 'Per opcode:']
+        for opcode, count in sorted(self.opcode_counts.items()):
+            lines.append(f'  {opcode:>2} {OPCODE_CLASSES[opcode]:<14} {count:>12}')
+
+        lines += ['', 'Time per opcode class:']
+        for op_class, elapsed in sorted(self.class_times.items(), key=lambda x: x[1], reverse=True):
+            lines.append(f'  {op_class:<17} {elapsed:>12.6f}s')
+
+        lines += ['', f'Hottest {n} addresses:']
+        for pos, count in self.hot_addresses(n):
+            lines.append(f'  {pos:>8} {count:>12}')
+
+        lines += [
+            '',
+            f'Memory high-water mark: {self.max_size} cells, {self.max_pages} pages of {PAGE_SIZE}',
+        ]
+
+        return '\n'.join(lines)
+
+
+class IntCodeProgram:
+    program: Sequence[int]
+    restart: bool
+    debug: bool
+    compiled = False
+    profiler: Optional[Profiler]
+    tracer: Optional[Tracer]
+
+    _inputs: Deque[int]
+    _image: Dict[int, List[int]]
+    _pages: Dict[int, List[int]]
+    _owned: Set[int]
+    _size: int
+    _pointer = 0
+    _outputs: List[int]
+    _base = 0
+    _decoded: Dict[int, Instruction]
+    # Compiled blocks by entry address, None where there is nothing to compile.
+    # Entries with an end in _block_ends are listed in _block_cells under
+    # every cell in [entry, end), and dropped when any of them is written.
+    _blocks: Dict[int, Optional[Block]]
+    _block_ends: Dict[int, int]
+    _block_cells: Dict[int, Tuple[int, ...]]
+    _recompiles: Dict[int, int]
+    _hits: Dict[int, int]
+
+    def __init__(self, program: Sequence[Union[int, str]], restart=True, debug=False, compiled=None, profile=False, trace=0):
+        if isinstance(program, array) and program.typecode == 'q':
+            # int64 images, like the ones from load_program(), are turned
+            # into pages straight from their buffer instead of value by value.
+            # Only the pages are used from then on, so there's no need to
+            # copy the image itself.
+            self.program = program
+            self._image = {}
+            with memoryview(program) as cells:
+                for i in range(0, len(program), PAGE_SIZE):
+                    page = cells[i:i+PAGE_SIZE].tolist()
+                    page.extend(ZERO_PAGE[len(page):])
+                    self._image[i >> PAGE_BITS] = page
+        else:
+            self.program = [int(x) for x in program]
+            self._image = {
+                i >> PAGE_BITS: (self.program[i:i+PAGE_SIZE] + [0] * PAGE_SIZE)[:PAGE_SIZE]
+                for i in range(0, len(self.program), PAGE_SIZE)
+            }
+        self._pages = dict(self._image)
+        self._owned = set()
+        self._size = len(self.program)
+        self._inputs = deque()
+        self._outputs = []
+        self._decoded = {}
+        self._blocks = {}
+        self._block_ends = {}
+        self._block_cells = {}
+        self._recompiles = {}
+        self._hits = {}
+        self.restart = restart
+        self.debug = debug
+        if compiled is not None:
+            self.compiled = compiled
+
+        self.profiler = Profiler() if profile else None
+        self.tracer = Tracer(trace or DEFAULT_TRACE_SIZE) if trace or debug else None
+
+    def __str__(self):
+        return f'''
+        Program:
+        {'  '.join([f'{x}({i}) <---' if i == self._pointer else f'{x}({i})' for i, x in self._cells()])}
+
+        Inputs:
+        {self._inputs}
+
+        Outputs:
+        {self._outputs}
+        '''
+
+    def _val_mode(self, pos: int, mode: int) -> int:
+        val = self._get_value(pos)
+        if mode == 0:
+            return self._get_value(val)
+        elif mode == 1:
+            return val
+        elif mode == 2:
+            return self._get_value(self._base + val)
+        else:
+            raise Exception(f"Unknown mode reading value: {mode}")
+
+    def _get_write_pos(self, pos: int, mode: int) -> int:
+        w_result_pos = self._get_value(pos)
+        if mode == 0:
+            return w_result_pos
+        elif mode == 2:
+            return w_result_pos + self._base
+        else:
+            raise Exception(f"Unknown mode for write position: {mode}")
+
+    def _decode(self, pos: int) -> Instruction:
+        try:
+            return self._decoded[pos]
+        except KeyError:
+            pass
+
+        op = self._get_value(pos)
+        opcode = op % 100
+        if opcode == 99:
+            instruction = (opcode, None, (), 1)
+        else:
+            try:
+                run_opcode = self.opcodes[opcode]
+            except KeyError:
+                raise Exception(f"Unknown operation at position ({pos}): {op}")
+
+            if self.profiler is not None:
+                run_opcode = self.profiler.wrap(opcode, run_opcode)
+            if self.tracer is not None:
+                run_opcode = self.tracer.wrap(opcode, run_opcode)
+
+            length = INSTRUCTION_LENGTHS[opcode]
+            modes = (op // 100 % 10, op // 1000 % 10, op // 10000 % 10)[:length-1]
+            instruction = (opcode, run_opcode, modes, length)
+
+        self._decoded[pos] = instruction
+        return instruction
+
+    def _set_value(self, pos: int, value: int) -> None:
+        page_idx = pos >> PAGE_BITS
+        if page_idx in self._owned:
+            page = self._pages[page_idx]
+        else:
+            # First write to a page since it was last shared: take a private copy
+            shared = self._pages.get(page_idx)
+            page = shared.copy() if shared is not None else [0] * PAGE_SIZE
+            self._pages[page_idx] = page
+            self._owned.add(page_idx)
+
+        page[pos & PAGE_MASK] = value
+        if pos >= self._size:
+            self._size = pos + 1
+
+        self._decoded.pop(pos, None)
+        if pos in self._block_cells:
+            for entry in self._block_cells[pos]:
+                self._drop_block(entry)
+
+    def _get_value(self, pos: int) -> int:
+        page = self._pages.get(pos >> PAGE_BITS)
+        if page is None:
+            return 0
+
+        return page[pos & PAGE_MASK]
+
+    def _hot_block(self, pos: int) -> Optional[Block]:
+        hits = self._hits.get(pos, 0) + 1
+        if hits < HOT_THRESHOLD:
+            self._hits[pos] = hits
+            return None
+
+        self._hits.pop(pos, None)
+        compiled = compile_block(self, pos)
+        if compiled is None:
+            # Only the cell at `pos` was looked at, rewriting it may give a
+            # block after all
+            block, end = None, pos + 1
+        else:
+            block, end = compiled
+
+        self._blocks[pos] = block
+        self._block_ends[pos] = end
+        for cell in range(pos, end):
+            self._block_cells[cell] = self._block_cells.get(cell, ()) + (pos,)
+
+        return block
+
+    def _drop_block(self, entry: int) -> None:
+        end = self._block_ends.pop(entry)
+        for cell in range(entry, end):
+            others = tuple(e for e in self._block_cells[cell] if e != entry)
+            if others:
+                self._block_cells[cell] = others
+            else:
+                del self._block_cells[cell]
+
+        if self._blocks.pop(entry) is not None:
+            recompiles = self._recompiles.get(entry, 0) + 1
+            self._recompiles[entry] = recompiles
+            if recompiles >= MAX_RECOMPILES:
+                self._blocks[entry] = None
+
+    def _cells(self) -> Iterator[Tuple[int, int]]:
+        for page_idx in sorted(self._pages):
+            start = page_idx << PAGE_BITS
+            for offset, val in enumerate(self._pages[page_idx][:max(0, self._size - start)]):
+                yield (start + offset, val)
+
+    '''
+    Opcode 1 adds together numbers read from two positions and stores
+    the result in a third position. The three integers immediately after
+    the opcode tell you these three positions.
+    '''
+    def _opcode_1(self, pos: int, m1: int, m2: int, m3: int):
+        val1 = self._val_mode(pos+1, m1)
+        val2 = self._val_mode(pos+2, m2)
+        w_result_pos = self._get_write_pos(pos+3, m3)
+
+        self._set_value(w_result_pos, val1+val2)
+
+    '''
+    Opcode 2 multiplies together numbers read from two positions and stores
+    the result in a third position. The three integers immediately after
+    the opcode tell you these three positions.
+    '''
+    def _opcode_2(self, pos: int, m1: int, m2: int, m3: int):
+        val1 = self._val_mode(pos+1, m1)
+        val2 = self._val_mode(pos+2, m2)
+        w_result_pos = self._get_write_pos(pos+3, m3)
+
+        self._set_value(w_result_pos, val1*val2)
+
+    '''
+    Opcode 3 takes a single integer as input and saves it to the position
+    given by its only parameter. For example, the instruction 3,50 would
+    take an input value and store it at address 50.
+    '''
+    def _opcode_3(self, pos: int, m: int):
+        if not self._inputs:
+            raise Exception(f"No remaining inputs")
+
+        _inp = self._inputs.popleft()
+
+        w_result_pos = self._get_write_pos(pos+1, m)
+        self._set_value(w_result_pos, _inp)
+
+    '''
+    Opcode 4 outputs the value of its only parameter.
+    For example, the instruction 4,50 would output the value at address 50.
+    '''
+    def _opcode_4(self, pos: int, m: int):
+        val = self._val_mode(pos+1, m)
+        self._outputs.append(val)
+
+    '''
+    Opcode 5 is jump-if-true: if the first parameter is non-zero, it sets
+    the instruction pointer to the value from the second parameter.
+    Otherwise, it does nothing.
+    '''
+    def _opcode_5(self, pos: int, m1: int, m2: int):
+        val1 = self._val_mode(pos+1, m1)
+        val2 = self._val_mode(pos+2, m2)
+
+        if val1 != 0:
+            self._pointer = val2
+
+    '''
+    Opcode 6 is jump-if-false: if the first parameter is zero, it sets
+    the instruction pointer to the value from the second parameter.
+    Otherwise, it does nothing.
+    '''
+    def _opcode_6(self, pos: int, m1: int, m2: int):
+        val1 = self._val_mode(pos+1, m1)
+        val2 = self._val_mode(pos+2, m2)
+
+        if val1 == 0:
+            self._pointer = val2
+
+    '''
+    Opcode 7 is less than: if the first parameter is less than the second
+    parameter, it stores 1 in the position given by the third parameter.
+    Otherwise, it stores 0.
+    '''
+    def _opcode_7(self, pos: int, m1: int, m2: int, m3: int):
+        val1 = self._val_mode(pos+1, m1)
+        val2 = self._val_mode(pos+2, m2)
+        w_result_pos = self._get_write_pos(pos+3, m3)
+
+        if val1 < val2:
+            self._set_value(w_result_pos, 1)
+        else:
+            self._set_value(w_result_pos, 0)
+
+    '''
+    Opcode 8 is equals: if the first parameter is equal to the second parameter,
+    it stores 1 in the position given by the third parameter.
+    Otherwise, it stores 0.
+    '''
+    def _opcode_8(self, pos: int, m1: int, m2: int, m3: int):
+        val1 = self._val_mode(pos+1, m1)
+        val2 = self._val_mode(pos+2, m2)
+        w_result_pos = self._get_write_pos(pos+3, m3)
+
+        if val1 == val2:
+            self._set_value(w_result_pos, 1)
+        else:
+            self._set_value(w_result_pos, 0)
+
+    '''
+    Opcode 9 adjusts the relative base by the value of its only parameter.
+    The relative base increases (or decreases, if the value is negative)
+    by the value of the parameter.
+    '''
+    def _opcode_9(self, pos: int, m1: int):
+        val1 = self._val_mode(pos+1, m1)
+        self._base += val1
+
+    opcodes = {
+        1: _opcode_1,
+        2: _opcode_2,
+        3: _opcode_3,
+        4: _opcode_4,
+        5: _opcode_5,
+        6: _opcode_6,
+        7: _opcode_7,
+        8: _opcode_8,
+        9: _opcode_9,
+    }
+
+    def read(self, pos: int) -> int:
+        return self._get_value(pos)
+
+    def write(self, pos: int, value: int) -> None:
+        self._set_value(pos, value)
+
+    def memory(self) -> List[int]:
+        return [self._get_value(i) for i in range(self._size)]
+
+    def add_inputs(self, *inputs: Union[int, str]) -> None:
+        self._inputs.extend(int(x) for x in inputs)
+
+    def _get_output(self) -> int:
+        if not self._outputs:
+            return 0
+        else:
+            return self._outputs[-1]
+
+    def reset(self) -> None:
+        self._pointer = 0
+        self._base = 0
+        self._pages = dict(self._image)
+        self._owned = set()
+        self._size = len(self.program)
+        self._decoded = {}
+        self._blocks = {}
+        self._block_ends = {}
+        self._block_cells = {}
+        self._recompiles = {}
+        self._hits = {}
+
+    def snapshot(self) -> Snapshot:
+        # From now on the pages are shared with the snapshot, so they have to
+        # be copied again before being written
+        self._owned = set()
+
+        return Snapshot(
+            pages=dict(self._pages),
+            size=self._size,
+            pointer=self._pointer,
+            base=self._base,
+            inputs=tuple(self._inputs),
+            outputs=tuple(self._outputs),
+        )
+
+    def restore(self, snapshot: Snapshot) -> None:
+        self._pages = dict(snapshot.pages)
+        self._owned = set()
+        self._size = snapshot.size
+        self._pointer = snapshot.pointer
+        self._base = snapshot.base
+        self._inputs = deque(snapshot.inputs)
+        self._outputs = list(snapshot.outputs)
+        self._decoded = {}
+        self._blocks = {}
+        self._block_ends = {}
+        self._block_cells = {}
+        self._recompiles = {}
+        self._hits = {}
+
+    def fork(self, snapshot: Optional[Snapshot] = None) -> 'IntCodeProgram':
+        '''
+        Returns a new machine in the same state as this one (or as `snapshot`,
+        if given). Memory pages are shared copy-on-write, so forking costs
+        nothing until one of the machines writes to a page.
+        '''
+        pg = IntCodeProgram([], restart=self.restart, debug=self.debug, compiled=self.compiled)
+        # Forks report to the same profiler and tracer, their decoded handlers
+        # already do
+        pg.profiler = self.profiler
+        pg.tracer = self.tracer
+        pg.program = self.program
+        pg._image = self._image
+        if snapshot is None:
+            pg.restore(self.snapshot())
+            pg._decoded = self._decoded.copy()
+            pg._blocks = self._blocks.copy()
+            pg._block_ends = self._block_ends.copy()
+            pg._block_cells = self._block_cells.copy()
+            pg._recompiles = self._recompiles.copy()
+        else:
+            pg.restore(snapshot)
+
+        return pg
+
+    def stream(self, inputs: Optional[Iterable[int]] = None) -> Generator[int, None, bool]:
+        '''
+        Runs the program from where it stopped, yielding every output as soon
+        as it is produced. Pending inputs from add_inputs() are consumed first,
+        then values are pulled lazily from `inputs`. A deque is used directly
+        as the input queue, so values appended to it between outputs are seen,
+        and pending inputs are moved to its front.
+
+        The generator returns True when the program halts and False when it
+        runs out of input, leaving the state ready to be resumed.
+        '''
+        source: Optional[Iterator[int]] = None
+        if isinstance(inputs, deque):
+            if inputs is not self._inputs:
+                # Keep pending inputs ahead of the caller's values
+                inputs.extendleft(reversed(self._inputs))
+                self._inputs = inputs
+        elif inputs is not None:
+            source = iter(inputs)
+
+        try:
+            return (yield from self._run(source))
+        except Exception:
+            if self.tracer is not None:
+                self.tracer.dump()
+            raise
+
+    def _run(self, source: Optional[Iterator[int]]) -> Generator[int, None, bool]:
+        # Compiled blocks run many instructions at once, so profiling, tracing
+        # and debugging always go through the interpreter
+        use_blocks = self.compiled and not self.debug and self.profiler is None and self.tracer is None
+
+        while self._pointer < self._size:
+            pointer = self._pointer
+            if use_blocks:
+                if pointer in self._blocks:
+                    block = self._blocks[pointer]
+                else:
+                    block = self._hot_block(pointer)
+
+                if block is not None:
+                    if block(self):
+                        yield self._outputs.pop()
+                    continue
+
+            opcode, run_opcode, modes, length = self._decode(pointer)
+            if opcode == 99:
+                return True
+
+            if opcode == 3 and not self._inputs:
+                if source is None:
+                    return False
+
+                try:
+                    self._inputs.append(int(next(source)))
+                except StopIteration:
+                    return False
+
+            # Jumps overwrite the pointer, everything else falls through
+            self._pointer = pointer + length
+            run_opcode(self, pointer, *modes)
+
+            if self.debug:
+                print(self.tracer.entries[-1])
+                input("Press enter to continue")
+
+            if opcode == 4:
+                yield self._outputs.pop()
+
+        return False
+
+    def run(self, max_steps: int) -> Tuple[Status, List[int]]:
+        '''
+        Executes at most `max_steps` instructions from where the program
+        stopped, and returns why it stopped along with the outputs produced
+        meanwhile. Running off the end of memory counts as halting.
+
+        Budgeted runs always go through the interpreter, so the step count is
+        exact.
+        '''
+        outputs: List[int] = []
+
+        try:
+            for _step in range(max_steps):
+                pointer = self._pointer
+                if pointer >= self._size:
+                    return (Status.HALTED, outputs)
+
+                opcode, run_opcode, modes, length = self._decode(pointer)
+                if opcode == 99:
+                    return (Status.HALTED, outputs)
+
+                if opcode == 3 and not self._inputs:
+                    return (Status.NEEDS_INPUT, outputs)
+
+                self._pointer = pointer + length
+                run_opcode(self, pointer, *modes)
+
+                if opcode == 4:
+                    outputs.append(self._outputs.pop())
+        except Exception:
+            if self.tracer is not None:
+                self.tracer.dump()
+            raise
+
+        return (Status.BUDGET_EXHAUSTED, outputs)
+
+    def output(self) -> Tuple[int, bool]:
+        self._outputs = []
+
+        if self.restart:
+            self.reset()
+
+        # stream() hands each value back as soon as it is produced; keep them
+        # all here so the last one can be returned
+        run = self.stream()
+        while True:
+            try:
+                self._outputs.append(next(run))
+            except StopIteration as e:
+                halted = e.value
+                break
+
+        return (self._get_output(), halted)
+
+    async def run_async(self, inputs: Channel, outputs: Channel) -> int:
+        '''
+        Runs the program until it halts, awaiting `inputs.get()` whenever it
+        needs a value and `outputs.put()` for every value it produces. Both
+        ends are typically asyncio.Queue objects shared with other machines,
+        so the event loop only wakes this one up when it has input.
+
+        Returns the last produced output (0 if there was none).
+        '''
+        last_output = 0
+        while True:
+            run = self.stream()
+            while True:
+                try:
+                    last_output = next(run)
+                except StopIteration as e:
+                    halted = e.value
+                    break
+
+                await outputs.put(last_output)
+
+            if halted or self._pointer >= self._size:
+                return last_output
+
+            self.add_inputs(await inputs.get())
+
+
+class Network:
+    '''
+    Runs IntCodeProgram nodes wired together by directed edges. Every value a
+    node outputs is appended to the input queue of each node it is connected
+    to, and the last value each node produced is kept in `last_outputs`.
+
+    Only nodes that have something to do sit in the ready queue: all of them
+    at the start, and afterwards only those that were just sent a value. A
+    tick therefore costs the same however many nodes are blocked on input.
+
+    With a `time_slice`, a node is only run for that many instructions at a
+    time before going to the back of the ready queue, so a node that never
+    blocks can't starve the others.
+    '''
+    nodes: Dict[Hashable, IntCodeProgram]
+    edges: Dict[Hashable, List[Hashable]]
+    last_outputs: Dict[Hashable, int]
+    halted: Set[Hashable]
+    time_slice: Optional[int]
+
+    _ready: Deque[Hashable]
+    _queued: Set[Hashable]
+
+    def __init__(self, time_slice: Optional[int] = None):
+        self.time_slice = time_slice
+        self.nodes = {}
+        self.edges = {}
+        self.last_outputs = {}
+        self.halted = set()
+        self._ready = deque()
+        self._queued = set()
+
+    def add_node(self, name: Hashable, pg: IntCodeProgram) -> None:
+        if name in self.nodes:
+            raise Exception(f"Node already in the network: {name}")
+
+        self.nodes[name] = pg
+        self.edges[name] = []
+        self._schedule(name)
+
+    def connect(self, src: Hashable, dst: Hashable) -> None:
+        if src not in self.nodes or dst not in self.nodes:
+            raise Exception(f"Unknown node in edge: {src} -> {dst}")
+
+        self.edges[src].append(dst)
+
+    def send(self, name: Hashable, *values: int) -> None:
+        self.nodes[name].add_inputs(*values)
+        self._schedule(name)
+
+    def _schedule(self, name: Hashable) -> None:
+        if name not in self._queued and name not in self.halted:
+            self._queued.add(name)
+            self._ready.append(name)
+
+    def _deliver(self, name: Hashable, value: int) -> None:
+        self.last_outputs[name] = value
+        for dst in self.edges[name]:
+            self.nodes[dst]._inputs.append(value)
+            self._schedule(dst)
+
+    def _run_node(self, name: Hashable) -> None:
+        pg = self.nodes[name]
+
+        if self.time_slice is not None:
+            status, outputs = pg.run(self.time_slice)
+            for value in outputs:
+                self._deliver(name, value)
+
+            if status == Status.HALTED:
+                self.halted.add(name)
+            elif status == Status.BUDGET_EXHAUSTED:
+                self._schedule(name)
+            return
+
+        run = pg.stream()
+        while True:
+            try:
+                value = next(run)
+            except StopIteration as e:
+                if e.value or pg._pointer >= pg._size:
+                    self.halted.add(name)
+                break
+
+            self._deliver(name, value)
+
+    def run(self) -> bool:
+        '''
+        Runs nodes until every one of them halted, returning True, or until
+        the ones left are all waiting for input nobody is going to send,
+        returning False. In the latter case the network can be resumed after
+        send()ing more values.
+        '''
+        while self._ready:
+            name = self._ready.popleft()
+            self._queued.discard(name)
+            self._run_node(name)
+
+        return len(self.halted) == len(self.nodes)
+
+
+class SharedRing:
+    '''
+    Single-producer/single-consumer ring buffer of int64 values in shared
+    memory, so two processes can exchange values without locks or pickling.
+    The header holds the read and write counters, a closed flag and the last
+    value written. Each counter is only written by one side, and a value is
+    stored before the counter that publishes it.
+
+    Python has no memory fences, so that order is only what the CPU makes of
+    two plain stores. x86 keeps stores in order and this is safe there. On
+    weakly ordered CPUs, like ARM, the other process may see the counter move
+    before the value it publishes.
+    '''
+    HEAD, TAIL, CLOSED, LAST = range(4)
+    HEADER_SIZE = 4
+
+    capacity: int
+    _shm: SharedMemory
+    _cells: memoryview
+
+    def __init__(self, capacity: int = RING_CAPACITY, name: Optional[str] = None):
+        self.capacity = capacity
+        if name is None:
+            self._shm = SharedMemory(create=True, size=8 * (self.HEADER_SIZE + capacity))
+        else:
+            self._shm = SharedMemory(name=name)
+
+        self._cells = self._shm.buf.cast('q')
+        if name is None:
+            self._cells[:self.HEADER_SIZE] = memoryview(bytes(8 * self.HEADER_SIZE)).cast('q')
+
+    def __getstate__(self):
+        return (self.capacity, self._shm.name)
+
+    def __setstate__(self, state):
+        capacity, name = state
+        self.__init__(capacity, name)
+
+    def _wait(self, spins: int) -> None:
+        if spins > RING_SPINS:
+            time.sleep(0.0001)
+
+    def put(self, value: int) -> None:
+        if not INT64_MIN <= value <= INT64_MAX:
+            raise Exception(f"Value doesn't fit in a shared ring: {value}")
+
+        cells = self._cells
+        tail = cells[self.TAIL]
+
+        spins = 0
+        while tail - cells[self.HEAD] >= self.capacity:
+            spins += 1
+            self._wait(spins)
+
+        cells[self.HEADER_SIZE + tail % self.capacity] = value
+        cells[self.LAST] = value
+        cells[self.TAIL] = tail + 1
+
+    def get(self) -> Optional[int]:
+        '''
+        Blocks until a value is available and returns it, or returns None
+        once the producer closed the ring and every value was read.
+        '''
+        cells = self._cells
+        head = cells[self.HEAD]
+
+        spins = 0
+        while cells[self.TAIL] == head:
+            # The producer may have published a last value right before
+            # closing, so look at the counter again once the flag is seen
+            if cells[self.CLOSED] and cells[self.TAIL] == head:
+                return None
+
+            spins += 1
+            self._wait(spins)
+
+        value = cells[self.HEADER_SIZE + head % self.capacity]
+        cells[self.HEAD] = head + 1
+
+        return value
+
+    def drain(self) -> None:
+        '''
+        Drops every value published so far, for a consumer that only cares
+        about last() and must keep the producer from blocking on a full ring.
+        '''
+        self._cells[self.HEAD] = self._cells[self.TAIL]
+
+    def close(self) -> None:
+        self._cells[self.CLOSED] = 1
+
+    def last(self) -> int:
+        return self._cells[self.LAST]
+
+    def release(self, unlink: bool = False) -> None:
+        self._cells.release()
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+
+def _pipeline_stage(program: List[int], inputs: SharedRing, outputs: SharedRing) -> None:
+    pg = IntCodeProgram(program, restart=False)
+
+    # Whatever happens, the next stage has to see the ring closed or it would
+    # wait for input forever
+    try:
+        while True:
+            run = pg.stream()
+            while True:
+                try:
+                    outputs.put(next(run))
+                except StopIteration as e:
+                    halted = e.value
+                    break
+
+            if halted or pg._pointer >= pg._size:
+                break
+
+            value = inputs.get()
+            if value is None:
+                break
+
+            pg.add_inputs(value)
+    finally:
+        outputs.close()
+        inputs.release()
+        outputs.release()
+
+
+def run_pipeline(program: List[int], stage_inputs: List[List[int]], loop: bool = False,
+                 capacity: int = RING_CAPACITY) -> int:
+    '''
+    Runs one OS process per stage, each a fresh machine for `program` that is
+    first given its `stage_inputs` and then the outputs of the stage before
+    it, through SharedRing buffers. With `loop` the last stage feeds the
+    first one, like the day 7 feedback loop.
+
+    Returns the last value produced by the final stage. If a stage fails the
+    others are stopped and an exception is raised.
+    '''
+    # Rings are seeded before any stage runs, so nobody would ever make room
+    # for inputs that don't fit
+    for idx, values in enumerate(stage_inputs):
+        if len(values) > capacity:
+            raise Exception(f'Too many inputs for stage {idx}: {len(values)}, ring capacity is {capacity}')
+
+    num_stages = len(stage_inputs)
+    rings: List[SharedRing] = []
+    stages: List[multiprocessing.Process] = []
+    try:
+        for _ in range(num_stages if loop else num_stages + 1):
+            rings.append(SharedRing(capacity))
+        for ring, values in zip(rings, stage_inputs):
+            for value in values:
+                ring.put(value)
+
+        stages = [
+            multiprocessing.Process(
+                target=_pipeline_stage,
+                args=(program, rings[idx], rings[(idx + 1) % len(rings)]),
+            )
+            for idx in range(num_stages)
+        ]
+        for p in stages:
+            p.start()
+
+        # Rings nobody reads from anymore: the output of the final stage when
+        # there is no loop, and the input of every stage that halted. They are
+        # drained here, or their producers would block once they are full.
+        unread = [] if loop else [rings[num_stages]]
+
+        # A stage that died can leave the one before it blocked on a full ring,
+        # so the first failure stops the whole pipeline
+        running = {p.sentinel: p for p in stages}
+        while running:
+            for ring in unread:
+                ring.drain()
+
+            for sentinel in wait(list(running), timeout=0.001 if unread else None):
+                p = running.pop(sentinel)
+                p.join()
+                unread.append(rings[stages.index(p)])
+                if p.exitcode != 0:
+                    for other in running.values():
+                        other.terminate()
+                    running = {}
+                    break
+
+        failed = [(idx, p.exitcode) for idx, p in enumerate(stages) if p.exitcode != 0]
+        if failed:
+            raise Exception(f'Pipeline stages failed (stage, exit code): {failed}')
+
+        return rings[num_stages % len(rings)].last()
+    finally:
+        for p in stages:
+            if p.is_alive():
+                p.terminate()
+            if p.pid is not None:
+                p.join()
+        for ring in rings:
+            ring.release(unlink=True)
+
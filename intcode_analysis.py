@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+
+import sys
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from intcode import INSTRUCTION_LENGTHS, WRITING_OPCODES, load_program
+
+
+MNEMONICS = {1: 'add', 2: 'mul', 3: 'in', 4: 'out', 5: 'jnz', 6: 'jz', 7: 'lt', 8: 'eq', 9: 'arb', 99: 'halt'}
+
+
+class Op(NamedTuple):
+    addr: int
+    opcode: int
+    modes: Tuple[int, ...]
+    params: Tuple[int, ...]
+
+    @property
+    def length(self) -> int:
+        return 1 + len(self.params)
+
+    @property
+    def num_reads(self) -> int:
+        return len(self.params) - (1 if self.opcode in WRITING_OPCODES else 0)
+
+    def cells(self) -> range:
+        return range(self.addr, self.addr + self.length)
+
+    def encode(self) -> List[int]:
+        op = self.opcode + sum(m * 10 ** (i + 2) for i, m in enumerate(self.modes))
+        return [op, *self.params]
+
+    def __str__(self) -> str:
+        operands = []
+        for mode, param in zip(self.modes, self.params):
+            if mode == 0:
+                operands.append(f'[{param}]')
+            elif mode == 1:
+                operands.append(str(param))
+            else:
+                operands.append(f'[rb{param:+d}]')
+
+        return f'{self.addr:>6}: {MNEMONICS[self.opcode]:<5} {" ".join(operands)}'.rstrip()
+
+
+def decode(program: Sequence[int], addr: int) -> Optional[Op]:
+    op = program[addr]
+    opcode = op % 100
+    if opcode == 99:
+        return Op(addr, 99, (), ())
+
+    if opcode not in INSTRUCTION_LENGTHS:
+        return None
+
+    length = INSTRUCTION_LENGTHS[opcode]
+    modes = tuple(op // 10 ** (i + 2) % 10 for i in range(length - 1))
+    if any(m not in (0, 1, 2) for m in modes) or opcode in WRITING_OPCODES and modes[-1] == 1:
+        return None
+
+    # Like the machine, read past the end of the program as zeros
+    params = tuple(program[addr+1:addr+length]) + (0,) * max(0, addr + length - len(program))
+    return Op(addr, opcode, modes, params)
+
+
+class Analysis:
+    '''
+    What can be told about a program without running it, starting from
+    address 0 and following every path the jumps allow.
+
+    `written` and `read` are the addresses instructions may write and read
+    through position mode, or None when some instruction uses relative mode
+    and any address could be touched. Cells outside `written` keep their
+    initial value, so reads and jump targets through them are resolved as
+    constants.
+    '''
+    program: List[int]
+    instructions: Dict[int, Op]
+    successors: Dict[int, List[int]]
+    traps: Set[int]
+    written: Optional[Set[int]]
+    read: Optional[Set[int]]
+    dynamic_jumps: bool
+    # Addresses outside the program that execution can reach. Past the end
+    # the machine halts, unless memory grew up to there.
+    exits: Set[int]
+
+    # Cells taken as possibly written while exploring, None to take every cell
+    _assumed: Optional[Set[int]] = None
+
+    def __init__(self, program: Sequence[int]):
+        self.program = list(program)
+
+        # The first pass folds no cell. Each later pass folds the cells no
+        # pass so far wrote to, and whatever new writes that uncovers are
+        # added before exploring again. Once a pass adds none, the first write
+        # outside `written` in a real run would have to come from an explored
+        # instruction, which can't be, so every fold is safe.
+        self._explore()
+        while self.written is not None:
+            self._assumed = self.written
+            self._explore()
+            if self.written is None:
+                break
+            if self.written <= self._assumed:
+                self.written = self._assumed
+                break
+            self.written |= self._assumed
+
+    def _constant(self, mode: int, param: int) -> Optional[int]:
+        if mode == 1:
+            return param
+        elif mode == 0 and self._assumed is not None and param not in self._assumed and param >= 0:
+            return self.program[param] if param < len(self.program) else 0
+
+        return None
+
+    def operand(self, op: Op, idx: int) -> Optional[int]:
+        return self._constant(op.modes[idx], op.params[idx])
+
+    def _explore(self) -> None:
+        instructions: Dict[int, Op] = {}
+        successors: Dict[int, List[int]] = {}
+        traps: Set[int] = set()
+        exits: Set[int] = set()
+        dynamic_jumps = False
+
+        pending = [0]
+        while pending:
+            addr = pending.pop()
+            if not 0 <= addr < len(self.program):
+                exits.add(addr)
+                continue
+            if addr in instructions or addr in traps:
+                continue
+
+            op = decode(self.program, addr)
+            if op is None:
+                traps.add(addr)
+                continue
+
+            instructions[addr] = op
+            nxt: List[int] = []
+            if op.opcode in (5, 6):
+                cond = self.operand(op, 0)
+                target = self.operand(op, 1)
+                may_jump = cond is None or (cond != 0) == (op.opcode == 5)
+                may_fall = cond is None or not may_jump
+
+                if may_jump:
+                    if target is None:
+                        dynamic_jumps = True
+                    else:
+                        nxt.append(target)
+                if may_fall:
+                    nxt.append(addr + 3)
+            elif op.opcode != 99:
+                nxt.append(addr + op.length)
+
+            successors[addr] = nxt
+            pending += nxt
+
+        written: Optional[Set[int]] = set()
+        read: Optional[Set[int]] = set()
+        for op in instructions.values():
+            for idx, (mode, param) in enumerate(zip(op.modes, op.params)):
+                is_write = op.opcode in WRITING_OPCODES and idx == len(op.params) - 1
+                accessed = written if is_write else read
+                if mode == 2:
+                    if is_write:
+                        written = None
+                    else:
+                        read = None
+                elif mode == 0 and accessed is not None:
+                    accessed.add(param)
+
+        self.instructions = instructions
+        self.successors = successors
+        self.traps = traps
+        self.written = written
+        self.read = read
+        self.dynamic_jumps = dynamic_jumps
+        self.exits = exits
+
+    def code_cells(self) -> Set[int]:
+        cells = set(self.traps)
+        for op in self.instructions.values():
+            cells.update(op.cells())
+
+        return cells
+
+    @property
+    def self_modifying(self) -> bool:
+        return self.written is None or not self.written.isdisjoint(self.code_cells())
+
+    @property
+    def static(self) -> bool:
+        # Everything about the program is known: where it jumps, what it reads
+        # and writes, and that it never rewrites its own code. Running past the
+        # end has to be a halt, so memory must never grow up to there.
+        if self.read is None or self.dynamic_jumps or self.self_modifying:
+            return False
+
+        return not self.exits or (
+            all(addr >= len(self.program) for addr in self.exits)
+            and all(addr < len(self.program) for addr in self.written)
+        )
+
+    def read_only_cells(self) -> Optional[Set[int]]:
+        if self.written is None:
+            return None
+
+        return set(range(len(self.program))) - self.written
+
+    def max_address(self) -> Optional[int]:
+        if not self.static:
+            return None
+
+        return max(self.code_cells() | self.read | self.written)
+
+    def blocks(self) -> Dict[int, List[Op]]:
+        '''
+        Splits the reachable instructions in basic blocks, keyed by the address
+        of their first instruction.
+        '''
+        preds: Dict[int, int] = {}
+        for succs in self.successors.values():
+            for s in succs:
+                preds[s] = preds.get(s, 0) + 1
+
+        leaders = {0}
+        for addr, succs in self.successors.items():
+            if len(succs) != 1 or succs[0] != addr + self.instructions[addr].length:
+                leaders.update(succs)
+        leaders.update(addr for addr, count in preds.items() if count > 1)
+
+        blocks: Dict[int, List[Op]] = {}
+        for leader in sorted(leaders & self.instructions.keys()):
+            block = [self.instructions[leader]]
+            while True:
+                succs = self.successors[block[-1].addr]
+                if len(succs) != 1 or succs[0] in leaders or succs[0] not in self.instructions:
+                    break
+                if succs[0] != block[-1].addr + block[-1].length:
+                    break
+                block.append(self.instructions[succs[0]])
+
+            blocks[leader] = block
+
+        return blocks
+
+    def cfg(self) -> Dict[int, List[int]]:
+        return {leader: self.successors[block[-1].addr] for leader, block in self.blocks().items()}
+
+
+def disassemble(program: Sequence[int]) -> str:
+    analysis = Analysis(program)
+    lines = []
+    for leader, block in analysis.blocks().items():
+        lines.append(f'block {leader} -> {analysis.successors[block[-1].addr]}')
+        lines += [f'  {op}' for op in block]
+
+    for addr in sorted(analysis.traps):
+        lines.append(f'trap {addr}: {program[addr]}')
+
+    return '\n'.join(lines)
+
+
+def _simplify(analysis: Analysis, op: Op) -> Op:
+    modes = list(op.modes)
+    params = list(op.params)
+    for idx in range(op.num_reads):
+        value = analysis.operand(op, idx)
+        if value is not None:
+            modes[idx], params[idx] = 1, value
+
+    if op.opcode in (1, 2, 7, 8) and modes[0] == modes[1] == 1:
+        a, b = params[0], params[1]
+        value = {1: a + b, 2: a * b, 7: int(a < b), 8: int(a == b)}[op.opcode]
+        return Op(op.addr, 1, (1, 1, modes[2]), (value, 0, params[2]))
+
+    if op.opcode in (5, 6) and modes[0] == 1:
+        taken = (params[0] != 0) == (op.opcode == 5)
+        if taken:
+            return Op(op.addr, 5, (1, modes[1]), (1, params[1]))
+        else:
+            return Op(op.addr, 5, (1, 1), (0, 0))
+
+    return Op(op.addr, op.opcode, tuple(modes), tuple(params))
+
+
+def optimize(program: Sequence[int]) -> List[int]:
+    '''
+    Returns a program that behaves like `program` but is cheaper to run:
+    operands read from cells that are never written become immediates,
+    arithmetic and jumps on immediates are folded, cells that are neither
+    reachable code nor read are zeroed and memory is sized to the highest
+    address the program can touch, unless it can run past its end.
+
+    Programs that can't be fully analysed (relative addressing, jumps to
+    computed addresses or self-modifying code) are returned unchanged.
+    '''
+    analysis = Analysis(program)
+    max_address = analysis.max_address()
+    if max_address is None:
+        return list(program)
+
+    # Instructions whose cells are also read as data or decoded as part of
+    # another instruction must stay as they are
+    untouchable = set(analysis.read) | analysis.traps
+    seen: Set[int] = set()
+    for op in analysis.instructions.values():
+        untouchable.update(seen.intersection(op.cells()))
+        seen.update(op.cells())
+        if op.addr + op.length > len(analysis.program):
+            untouchable.update(op.cells())
+
+    ops = [
+        op if untouchable.intersection(op.cells()) else _simplify(analysis, op)
+        for op in analysis.instructions.values()
+    ]
+
+    kept = set(analysis.traps)
+    for op in ops:
+        kept.update(op.cells())
+        for idx in range(op.num_reads):
+            if op.modes[idx] == 0:
+                kept.add(op.params[idx])
+
+    # Running past the end halts or not depending on how far memory has grown
+    # by then, so programs that can get there keep their size
+    size = len(analysis.program) if analysis.exits else max_address + 1
+    optimized = [0] * size
+    for cell in kept:
+        if 0 <= cell < len(analysis.program):
+            optimized[cell] = analysis.program[cell]
+
+    # Instructions left as they were keep their original cells, which may not
+    # be the canonical encoding
+    for op in ops:
+        if op != analysis.instructions[op.addr]:
+            optimized[op.addr:op.addr+op.length] = op.encode()[:size-op.addr]
+
+    return optimized
+
+
+if __name__ == "__main__":
+    program = load_program(sys.argv[1])
+    analysis = Analysis(program)
+
+    print(disassemble(program))
+    print()
+    print(f'Reachable instructions: {len(analysis.instructions)}')
+    print(f'Static: {analysis.static}')
+    print(f'Self-modifying: {analysis.self_modifying}')
+    print(f'Jumps to computed addresses: {analysis.dynamic_jumps}')
+    print(f'Max address: {analysis.max_address()}')
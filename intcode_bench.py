@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+import sys
+import time
+from collections import deque
+from itertools import repeat
+from typing import Callable, Dict, List, Tuple
+
+from intcode import IntCodeProgram
+from intcode_analysis import optimize
+
+
+# Loop bodies for each opcode mix. They are built from the address of a small
+# scratch area placed right after the loop, which starts as [0, 1, 2, ...]
+MIXES: Dict[str, Callable[[int], List[List[int]]]] = {
+    'add/mul': lambda s: [
+        [1, s, s+1, s+2],
+        [2, s, s+1, s+3],
+        [1101, 3, 4, s+4],
+        [1102, 3, 4, s+5],
+    ],
+    'compare': lambda s: [
+        [7, s, s+1, s+2],
+        [8, s, s+1, s+3],
+        [1107, 3, 4, s+4],
+        [1108, 4, 4, s+5],
+    ],
+    'jumps': lambda s: [
+        [1105, 0, 0],
+        [1106, 1, 0],
+        [5, s, s],
+        [6, s+1, s],
+    ],
+    'relative': lambda s: [
+        [109, 1],
+        [2201, s, s+1, s+3],
+        [109, -1],
+        [22201, s, s+1, s+3],
+    ],
+    'io': lambda s: [
+        [3, s],
+        [4, s],
+    ],
+}
+
+SCRATCH_SIZE = 8
+
+TIERS = [
+    ('interpreted', False, False),
+    ('compiled', True, False),
+    ('optimized', False, True),
+    ('opt+comp', True, True),
+]
+
+
+def loop_program(mix: str, iterations: int) -> Tuple[List[int], int]:
+    '''
+    Returns a program running the `mix` body `iterations` times and the
+    number of instructions it executes before halting.
+    '''
+    # Layout: body, counter decrement, jump back to 0, halt, counter, scratch
+    body_size = sum(len(i) for i in MIXES[mix](0))
+    counter = body_size + 8
+    scratch = counter + 1
+
+    body = MIXES[mix](scratch)
+    program = [cell for instruction in body for cell in instruction]
+    program += [1001, counter, -1, counter]
+    program += [1005, counter, 0]
+    program += [99]
+    program += [iterations]
+    program += list(range(SCRATCH_SIZE))
+
+    return (program, iterations * (len(body) + 2))
+
+
+def bench(mix: str, iterations: int, compiled: bool = False, optimized: bool = False) -> Tuple[int, float]:
+    program, instructions = loop_program(mix, iterations)
+    if optimized:
+        program = optimize(program)
+    pg = IntCodeProgram(program, compiled=compiled)
+
+    start = time.perf_counter()
+    deque(pg.stream(repeat(1)), maxlen=0)
+    elapsed = time.perf_counter() - start
+
+    return (instructions, elapsed)
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    print(f"{'mix':<10} {'tier':<12} {'instructions':>14} {'seconds':>10} {'instr/s':>14}")
+    for mix in MIXES:
+        for tier, compiled, optimized in TIERS:
+            instructions, elapsed = bench(mix, iterations, compiled, optimized)
+            print(f"{mix:<10} {tier:<12} {instructions:>14} {elapsed:>10.3f} {instructions / elapsed:>14.0f}")
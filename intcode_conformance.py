@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+from collections import deque
+from types import ModuleType
+from typing import Callable, Dict, List, Tuple
+
+from days import ROOT, load_day
+from intcode import IntCodeProgram, Network, Status, load_program, run_pipeline
+from intcode_analysis import optimize
+
+
+def read_program(name: str) -> List[int]:
+    with open(os.path.join(ROOT, name), 'r') as file:
+        return [int(x) for x in file.read().split(',')]
+
+
+def read_cables(name: str) -> List[List[str]]:
+    with open(os.path.join(ROOT, name), 'r') as file:
+        return [x.split(',') for x in file.read().splitlines()]
+
+
+def stream_wires(day_03: ModuleType, name: str) -> Tuple[int, int]:
+    wires = day_03.WireStream()
+    with open(os.path.join(ROOT, name), 'r') as file:
+        wires.read_from(file)
+
+    return (wires.best_distance, wires.best_steps)
+
+
+def reload_after_edit() -> Tuple[List[int], List[int]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'program.txt')
+        with open(path, 'w') as file:
+            file.write('104,1,99')
+        before = run(load_program(path))
+
+        # Same size, so only the modification time tells the versions apart
+        with open(path, 'w') as file:
+            file.write('104,2,99')
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+
+        return (before, run(load_program(path)))
+
+
+def run(program: List[int], *inputs: int) -> List[int]:
+    pg = IntCodeProgram(program)
+    pg.add_inputs(*inputs)
+
+    return list(pg.stream())
+
+
+def profiled(program: List[int]) -> Tuple[Dict[int, int], Dict[int, int]]:
+    pg = IntCodeProgram(program, profile=True)
+    pg.output()
+
+    return (pg.profiler.opcode_counts, pg.profiler.address_counts)
+
+
+def traced_crash(program: List[int], size: int) -> Tuple[str, List[int]]:
+    pg = IntCodeProgram(program, trace=size)
+    dump = io.StringIO()
+    with contextlib.redirect_stderr(dump):
+        try:
+            pg.output()
+        except Exception:
+            pass
+
+    header, *entries = dump.getvalue().splitlines()
+    return (header, [int(entry.split(':')[0]) for entry in entries])
+
+
+def batch_matches_exact(day_02: ModuleType, program: List[int], pairs: List[Tuple[int, int]]) -> bool:
+    base = IntCodeProgram(program, restart=False)
+    exact = [day_02.pg_result(base, noun, verb) for noun, verb in pairs]
+
+    return list(day_02.pg_results_batch(program, pairs)) == exact
+
+
+def run_budgeted(program: List[int], budgets: List[int], *inputs: int) -> List[Tuple[Status, List[int]]]:
+    pg = IntCodeProgram(program, restart=False)
+    pg.add_inputs(*inputs)
+
+    return [pg.run(budget) for budget in budgets]
+
+
+def sliced_feedback_loop(program: List[int], phase_settings: List[int], time_slice: int) -> int:
+    network = Network(time_slice)
+    for idx, phase in enumerate(phase_settings):
+        network.add_node(idx, IntCodeProgram(program, restart=False))
+        network.send(idx, phase)
+
+    for idx in range(len(phase_settings)):
+        network.connect(idx, (idx + 1) % len(phase_settings))
+
+    network.send(0, 0)
+    network.run()
+
+    return network.last_outputs[len(phase_settings) - 1]
+
+
+def pipeline_error(program: List[int], stage_inputs: List[List[int]]) -> str:
+    try:
+        run_pipeline(program, stage_inputs)
+    except Exception:
+        return 'raised'
+
+    return 'finished'
+
+
+def pipeline_result(program: List[int], stage_inputs: List[List[int]], loop: bool = False) -> int:
+    return run_pipeline(program, stage_inputs, loop=loop)
+
+
+def stream_after_pending(program: List[int], pending: List[int], queued: List[int]) -> List[int]:
+    pg = IntCodeProgram(program)
+    pg.add_inputs(*pending)
+
+    return list(pg.stream(deque(queued)))
+
+
+QUINE = [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99]
+CMP_8 = [3, 9, 8, 9, 10, 9, 4, 9, 99, -1, 8]
+JUMP = [3, 12, 6, 12, 15, 1, 13, 14, 13, 4, 13, 99, -1, 0, 1, 9]
+AMP = [3, 15, 3, 16, 1002, 16, 10, 16, 1, 16, 15, 15, 4, 15, 99, 0, 0]
+FEEDBACK = [
+    3, 26, 1001, 26, -4, 26, 3, 27, 1002, 27, 2, 27, 1, 27, 26, 27, 4, 27, 1001, 28, -1, 28,
+    1005, 28, 6, 99, 0, 0, 5,
+]
+# The opcode at 4 is the sum of a cell from 20-29, picked by the noun, and one
+# from 30-39, picked by the verb. Some pairs give add and halt, which stay in
+# the batch. Others give immediate or relative modes, which the batch leaves
+# to the exact interpreter, and 2 multiplies 2^40 by itself, past int64.
+BATCH_GRID = [1, 0, 0, 4, 0, 11, 11, 0, 99, 0, 0, 2 ** 40] + [0] * 8 + [1, 2, 99, 1101, 1102] * 2 + [0, 1000] * 5
+BATCH_PAIRS = [(noun, verb) for noun in range(20, 30) for verb in range(30, 40)]
+
+# Outputs 2, 1 and 0 from a loop of three instructions
+COUNTDOWN = [1001, 10, -1, 10, 4, 10, 1005, 10, 0, 99, 3]
+
+# Runs its loop twice and then reaches an unknown opcode
+CRASH = [1001, 9, -1, 9, 1005, 9, 0, 77, 0, 2]
+
+# Halts on input 0, otherwise outputs 1 to 2000, more than a ring can hold
+LONG_OUTPUT = [3, 20, 1006, 20, 18, 1001, 19, 1, 19, 4, 19, 1008, 19, 2000, 21, 1006, 21, 5, 99, 0, 0, 0]
+
+# Pair (0, 0) gives 1, but later pairs like (0, 3) run into opcode 0, so only
+# a search that stops at the first match gets through
+EARLY_MATCH = [1, 0, 0, 6, 1, 0, 8, 11, 2, 11, 16, 7, 99, 3, 3, 5, 0]
+
+# Each flag gates the code that sets the next one, so the code that outputs is
+# only found once the analysis knows both flags are written
+FLAG_CHAIN = [
+    1005, 40, 10, 1101, 1, 0, 40, 1105, 1, 0, 1005, 41, 20, 1101, 1, 0, 41, 1105, 1, 10, 104, 42, 99,
+] + [0] * 19
+
+# Sums ten cells by bumping the operand of its own add, so the block holding
+# that add is invalidated on every pass
+SELF_WALK = [1, 18, 20, 18, 1001, 2, 1, 2, 1001, 19, -1, 19, 1005, 19, 0, 4, 18, 99, 0, 10] + list(range(10))
+
+# Writes a loop to addresses -14 to -1 and jumps there
+NEGATIVE_CODE = [1001, 62, -1, 62, 1001, 63, 2, 63, 1005, 62, -14, 1105, 1, 59]
+NEGATIVE_LOOP = [x for i, v in enumerate(NEGATIVE_CODE) for x in (1101, v, 0, i - 14)] + [1105, 1, -14, 4, 63, 99, 5, 0]
+
+
+def cases() -> List[Tuple[str, Callable[[], object], object]]:
+    day_02 = load_day('02')
+    day_03 = load_day('03')
+    day_05 = load_day('05')
+    day_07 = load_day('07')
+    day_09 = load_day('09')
+
+    return [
+        # Examples from the puzzle statements
+        ('02 add/mul example', lambda: day_02.parse_program([1, 9, 10, 3, 2, 3, 11, 0, 99, 30, 40, 50])[0], 3500),
+        ('02 self-modifying example', lambda: day_02.parse_program([1, 1, 1, 4, 99, 5, 6, 0, 99]), [30, 1, 1, 4, 2, 5, 6, 0, 99]),
+        ('05 equal to 8', lambda: run(CMP_8, 8), [1]),
+        ('05 not equal to 8', lambda: run(CMP_8, 7), [0]),
+        ('05 jump on zero', lambda: run(JUMP, 0), [0]),
+        ('05 jump on non-zero', lambda: run(JUMP, 3), [1]),
+        ('07 amplifier chain', lambda: day_07.calculate_thruster_signal(IntCodeProgram(AMP, restart=False), [4, 3, 2, 1, 0]), 43210),
+        ('07 feedback loop', lambda: day_07.calculate_thruster_signal_feedback_loop(FEEDBACK, [9, 8, 7, 6, 5]), 139629729),
+        ('07 feedback loop sliced by 1', lambda: sliced_feedback_loop(FEEDBACK, [9, 8, 7, 6, 5], 1), 139629729),
+        ('07 feedback loop sliced by 3', lambda: sliced_feedback_loop(FEEDBACK, [9, 8, 7, 6, 5], 3), 139629729),
+        ('07 feedback loop sliced by 50', lambda: sliced_feedback_loop(FEEDBACK, [9, 8, 7, 6, 5], 50), 139629729),
+        ('07 feedback loop on asyncio', lambda: asyncio.run(day_07.run_feedback_loop(FEEDBACK, [9, 8, 7, 6, 5])), 139629729),
+        ('07 amplifier chain on processes', lambda: day_07.calculate_thruster_signal_multicore(AMP, [4, 3, 2, 1, 0], feedback=False), 43210),
+        ('pipeline stage past int64', lambda: pipeline_error([3, 9, 1102, 2 ** 40, 2 ** 40, 10, 4, 10, 99, 0, 0], [[1], []]), 'raised'),
+        ('pipeline output past ring capacity', lambda: pipeline_result(LONG_OUTPUT, [[1]]), 2000),
+        ('pipeline loop past a halted stage', lambda: pipeline_result(LONG_OUTPUT, [[0], [1]], loop=True), 2000),
+        ('pipeline inputs past ring capacity', lambda: pipeline_error(LONG_OUTPUT, [[1] * 2000]), 'raised'),
+        ('07 feedback loop on processes', lambda: day_07.calculate_thruster_signal_multicore(FEEDBACK, [9, 8, 7, 6, 5]), 139629729),
+        ('05 optimized equal to 8', lambda: run(optimize(CMP_8), 8), [1]),
+        ('05 optimized jump on zero', lambda: run(optimize(JUMP), 0), [0]),
+        ('05 optimized jump on non-zero', lambda: run(optimize(JUMP), 3), [1]),
+        ('optimized chain of flag jumps', lambda: run(optimize(FLAG_CHAIN)), [42]),
+        ('07 optimized feedback loop', lambda: day_07.calculate_thruster_signal_feedback_loop(optimize(FEEDBACK), [9, 8, 7, 6, 5]), 139629729),
+        ('profiled countdown', lambda: profiled(COUNTDOWN), ({1: 3, 4: 3, 5: 3}, {0: 3, 4: 3, 6: 3})),
+        ('trace dumped on a crash', lambda: traced_crash(CRASH, 3), ('Last 3 executed instructions:', [4, 0, 4])),
+        ('budget exhausted', lambda: run_budgeted([104, 1, 104, 2, 99], [1, 1, 1]),
+         [(Status.BUDGET_EXHAUSTED, [1]), (Status.BUDGET_EXHAUSTED, [2]), (Status.HALTED, [])]),
+        ('budget needs input', lambda: run_budgeted([104, 7, 3, 0, 4, 0, 99], [10]), [(Status.NEEDS_INPUT, [7])]),
+        ('budget halted', lambda: run_budgeted([3, 0, 4, 0, 99], [10], 5), [(Status.HALTED, [5])]),
+        ('budget halted past the end', lambda: run_budgeted([104, 3], [10]), [(Status.HALTED, [3])]),
+        ('pending inputs before a deque', lambda: stream_after_pending([3, 0, 4, 0, 3, 0, 4, 0, 99], [7], [8]), [7, 8]),
+        ('09 quine', lambda: run(QUINE), QUINE),
+        ('cached program reloaded after an edit', reload_after_edit, ([1], [2])),
+        ('self-modifying walk', lambda: run(SELF_WALK), [45]),
+        ('loop at negative addresses', lambda: run(NEGATIVE_LOOP), [10]),
+        ('09 big multiplication', lambda: run([1102, 34915192, 34915192, 7, 4, 7, 99, 0]), [1219070632396864]),
+        ('09 big literal', lambda: run([104, 1125899906842624, 99]), [1125899906842624]),
+        ('09 int64 overflow', lambda: run([1102, 2 ** 62, 4, 11, 1, 11, 11, 11, 4, 11, 99, 0]), [2 ** 65]),
+        ('09 int64 underflow', lambda: run([1102, -2 ** 62, 3, 9, 4, 9, 99]), [-3 * 2 ** 62]),
+        ('09 far relative write', lambda: run([109, 10 ** 9, 21101, 5, 6, 0, 204, 0, 99]), [11]),
+        # Answers for the shipped inputs
+        ('02 part 1', lambda: day_02.part_1(read_program('02.txt')), 4090689),
+        ('02 part 2', lambda: day_02.part_2(read_program('02.txt'), 19690720), 7733),
+        ('03 streamed', lambda: stream_wires(day_03, '03.txt'), (260, 15612)),
+        # Three cables, so the parallel sweep has two of them to share out
+        ('03 part 1 on 2 workers', lambda: day_03.part_1((read_cables('03.txt') * 2)[:3], workers=2), 260),
+        ('03 part 2 on 2 workers', lambda: day_03.part_2((read_cables('03.txt') * 2)[:3], workers=2), 16687),
+        ('02 batch grid against the exact interpreter', lambda: batch_matches_exact(day_02, BATCH_GRID, BATCH_PAIRS), True),
+        ('02 batch search stops at the first match', lambda: day_02.part_2(EARLY_MATCH, 1, symbolic=False, batch=True), 0),
+        ('05 part 1', lambda: day_05.part_1(read_program('05.txt')), 16348437),
+        ('05 part 2', lambda: day_05.part_2(read_program('05.txt')), 6959377),
+        ('07 part 1', lambda: day_07.part_1(read_program('07.txt')), 47064),
+        ('07 part 2', lambda: day_07.part_2(read_program('07.txt')), 4248984),
+        ('07 part 2 on 2 workers', lambda: day_07.part_2(read_program('07.txt'), workers=2), 4248984),
+        ('09 part 1', lambda: day_09.part_1(read_program('09.txt')), 3906448201),
+        ('09 part 2', lambda: day_09.part_2(read_program('09.txt')), 59785),
+    ]
+
+
+if __name__ == "__main__":
+    failed = 0
+    for tier, compiled in [('interpreted', False), ('compiled', True)]:
+        IntCodeProgram.compiled = compiled
+
+        for name, case, expected in cases():
+            try:
+                got = case()
+            except Exception as e:
+                got = e
+
+            if got == expected:
+                print(f"ok    [{tier}] {name}")
+            else:
+                failed += 1
+                print(f"FAIL  [{tier}] {name}: expected {expected}, got {got!r}")
+
+    sys.exit(1 if failed else 0)